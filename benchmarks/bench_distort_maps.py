@@ -0,0 +1,113 @@
+"""
+Compare peak RSS and wall time of the distort map builder against the
+original full-frame float64 implementation at several resolutions.
+
+Each measurement runs in a fresh process so peak RSS is not polluted by
+earlier runs.
+
+    python benchmarks/bench_distort_maps.py
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import time
+
+import cv2
+import numpy as np
+
+from stereo_calibration_check.calibrate.distort import build_distort_maps
+from stereo_calibration_check.utils.file_utils import load_intrinsics
+
+RESOLUTIONS = [(640, 512), (1280, 1024), (1920, 1536), (2560, 2048)]
+
+
+def legacy_build_distort_maps(intrinsics: dict, P_new: np.ndarray,
+                              size: tuple[int, int]):
+    """
+    The original distort_image map construction, kept for comparison.
+    """
+    w, h = size
+    K = np.array(intrinsics['K'])
+    D = np.array(intrinsics['D'])
+    R = np.array(intrinsics['R'])
+    grid_x, grid_y = np.meshgrid(np.arange(w), np.arange(h))
+    distorted_points = np.stack([grid_x, grid_y], axis=-1).reshape(-1, 1, 2).astype(np.float32)
+    undistorted_norm = cv2.fisheye.undistortPoints(distorted_points, K, D)
+    vectors_orig = np.concatenate([undistorted_norm.reshape(-1, 2), np.ones((h*w, 1))], axis=1)
+    vectors_rect = (R @ vectors_orig.T).T
+    K_rect = P_new[:3, :3]
+    rectified_pixels_homo = (K_rect @ vectors_rect.T).T
+    map_x = rectified_pixels_homo[:, 0] / rectified_pixels_homo[:, 2]
+    map_y = rectified_pixels_homo[:, 1] / rectified_pixels_homo[:, 2]
+    map_x = map_x.reshape(h, w).astype(np.float32)
+    map_y = map_y.reshape(h, w).astype(np.float32)
+    return map_x, map_y
+
+
+def scaled_intrinsics(intrinsics: dict, size: tuple[int, int]) -> dict:
+    """
+    Scale the bundled calibration to another resolution.
+    """
+    scale = size[0] / intrinsics['width']
+    scaled = dict(intrinsics)
+    scaled['K'] = intrinsics['K'] * [[scale], [scale], [1]]
+    scaled['P'] = intrinsics['P'] * [[scale], [scale], [1]]
+    scaled['width'], scaled['height'] = size
+    return scaled
+
+
+def _measure(impl: str, calib: str, size: tuple[int, int], repeat: int,
+             queue) -> None:
+    intrinsics = scaled_intrinsics(load_intrinsics(calib), size)
+    image = np.random.default_rng(0).integers(0, 255, size[::-1],
+                                              dtype=np.uint8)
+    builder = legacy_build_distort_maps if impl == 'legacy' else build_distort_maps
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    build_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        map1, map2 = builder(intrinsics, intrinsics['P'], size)
+        build_times.append(time.perf_counter() - start)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        cv2.remap(image, map1, map2, cv2.INTER_LINEAR,
+                  borderMode=cv2.BORDER_CONSTANT)
+    remap_time = (time.perf_counter() - start) / repeat
+
+    # ru_maxrss is reported in KiB on Linux.
+    queue.put((min(build_times), remap_time, (peak_rss - base_rss) / 1024))
+
+
+def measure(impl: str, calib: str, size: tuple[int, int],
+            repeat: int) -> tuple[float, float, float]:
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure,
+                          args=(impl, calib, size, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distort map builder benchmark")
+    parser.add_argument('--calib', type=str, default='data/calibration/thermal_left.yaml',
+                        help='Calibration file to scale to each resolution')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed repetitions per case')
+    args = parser.parse_args()
+
+    print(f"{'size':>11} {'impl':>7} {'build ms':>9} {'remap ms':>9} {'peak MiB':>9}")
+    for size in RESOLUTIONS:
+        for impl in ('legacy', 'fused'):
+            build, remap, peak = measure(impl, args.calib, size, args.repeat)
+            print(f"{size[0]:>5}x{size[1]:<5} {impl:>7} {build * 1e3:9.1f} "
+                  f"{remap * 1e3:9.2f} {peak:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark the rectify / distort / check hot paths and store the results as
+JSON so runs of different versions can be compared.
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json
+
+Frames are the bundled rectified thermal pair, resized to each resolution,
+with the bundled calibration scaled to match. Peak memory is what Python and
+NumPy allocate during a stage (tracemalloc), which includes arrays returned
+by OpenCV but not OpenCV's internal buffers.
+"""
+from importlib import metadata
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from bench_distort_maps import scaled_intrinsics
+from stereo_calibration_check.calibrate.distort import Redistorter, build_distort_maps
+from stereo_calibration_check.calibrate.map_cache import MapCache
+from stereo_calibration_check.calibrate.round_trip import RoundTripCheck
+from stereo_calibration_check.calibrate.stereo_calibrate import get_projection_matrix
+from stereo_calibration_check.calibrate.undistort import Rectifier, build_rectify_maps
+from stereo_calibration_check.epipolar_calibration_check.epipolar_error import compute_epipolar_error
+from stereo_calibration_check.epipolar_calibration_check.epipolar_line import (filter_margin,
+                                                                                fit_fundamental,
+                                                                                render_epilines)
+from stereo_calibration_check.feature_detection.sift import sift_feature_detection
+from stereo_calibration_check.utils.file_utils import load_intrinsics
+
+RESOLUTIONS = [(640, 512), (1280, 1024), (1920, 1536)]
+
+
+def measure(fn, repeat: int) -> dict:
+    """
+    Run fn once to warm up, then time it repeat times and trace the peak
+    memory of one more run.
+    """
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'min_s': min(times),
+        'median_s': statistics.median(times),
+        'peak_mib': peak / 2**20,
+    }
+
+
+def stages(args: argparse.Namespace, size: tuple[int, int]) -> dict:
+    """
+    Return the benchmarked stages for one resolution, name -> callable.
+    """
+    intrinsics1 = scaled_intrinsics(load_intrinsics(args.left_calib), size)
+    intrinsics2 = scaled_intrinsics(load_intrinsics(args.right_calib), size)
+    R1, R2, P1, P2 = get_projection_matrix(intrinsics1, intrinsics2)
+    img1 = cv2.resize(cv2.imread(args.left_image, cv2.IMREAD_GRAYSCALE), size,
+                      interpolation=cv2.INTER_CUBIC)
+    img2 = cv2.resize(cv2.imread(args.right_image, cv2.IMREAD_GRAYSCALE), size,
+                      interpolation=cv2.INTER_CUBIC)
+
+    rectifier = Rectifier(intrinsics1, R1, P1, cache=MapCache())
+    redistorter = Redistorter(intrinsics1, intrinsics1['P'], cache=MapCache())
+    round_trip = RoundTripCheck(intrinsics1, cache=MapCache())
+    rectifier.maps(size)
+    redistorter.maps(size)
+    round_trip.geometry(size)
+
+    margin = round(100 * size[0] / 640)
+    pts1, pts2 = sift_feature_detection(img1, img2)
+    pts1, pts2 = filter_margin(pts1, pts2, size[0], size[1], margin)
+    F, inliers1, inliers2 = fit_fundamental(pts1, pts2)
+
+    return {
+        'rectify_build': lambda: build_rectify_maps(intrinsics1, R1, P1, size),
+        'rectify_remap': lambda: rectifier(img1),
+        'distort_build': lambda: build_distort_maps(intrinsics1,
+                                                    intrinsics1['P'], size),
+        'distort_remap': lambda: redistorter(img1),
+        'round_trip': lambda: round_trip.check(img1),
+        'sift': lambda: sift_feature_detection(img1, img2),
+        'fundamental': lambda: fit_fundamental(pts1, pts2),
+        'drawlines': lambda: render_epilines(img1, img2, F, inliers1,
+                                             inliers2),
+        'epipolar_error': lambda: compute_epipolar_error(img1, img2,
+                                                         margin=margin),
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    results = []
+    for size in RESOLUTIONS:
+        for name, fn in stages(args, size).items():
+            if args.stages and name not in args.stages:
+                continue
+            result = {'stage': name, 'resolution': f'{size[0]}x{size[1]}'}
+            result.update(measure(fn, args.repeat))
+            results.append(result)
+            print(f"{result['resolution']:>10} {name:>15} "
+                  f"{result['median_s'] * 1e3:9.2f} ms "
+                  f"{result['peak_mib']:8.1f} MiB", file=sys.stderr)
+    return {
+        'meta': {
+            'version': metadata.version('stereo-calibration-check'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> int:
+    """
+    Print the time ratio of each stage against the baseline and return the
+    number of stages slower than 1 + tolerance times the baseline.
+    """
+    base = {(r['stage'], r['resolution']): r for r in baseline['results']}
+    regressions = 0
+    print(f"{'resolution':>10} {'stage':>15} {'base ms':>9} {'now ms':>9} {'ratio':>6}")
+    for result in current['results']:
+        key = (result['stage'], result['resolution'])
+        if key not in base:
+            continue
+        ratio = result['median_s'] / base[key]['median_s']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = ' REGRESSION'
+            regressions += 1
+        print(f"{key[1]:>10} {key[0]:>15} {base[key]['median_s'] * 1e3:9.2f} "
+              f"{result['median_s'] * 1e3:9.2f} {ratio:6.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot path benchmarks")
+    parser.add_argument('--left_image', type=str, default='data/images/thermal_left_rectified.png',
+                        help='Left rectified image')
+    parser.add_argument('--right_image', type=str, default='data/images/thermal_right_rectified.png',
+                        help='Right rectified image')
+    parser.add_argument('--left_calib', type=str, default='data/calibration/thermal_left.yaml',
+                        help='Path to the left camera calibration file')
+    parser.add_argument('--right_calib', type=str, default='data/calibration/thermal_right.yaml',
+                        help='Path to the right camera calibration file')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed repetitions per stage')
+    parser.add_argument('--stages', nargs='*', default=None,
+                        help='Only run these stages')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the results to this JSON file')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Allowed slowdown against the baseline')
+    args = parser.parse_args()
+
+    current = run(args)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(current, file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(baseline, current, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
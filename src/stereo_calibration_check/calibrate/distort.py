@@ -1,56 +1,108 @@
 import cv2
 import numpy as np
 
-def distort_image(image: np.ndarray, intrinsics: dict, P_new: np.ndarray) -> np.ndarray:
+from ..utils.profiling import timed
+from .map_cache import (CachedRemapper, MapCache, Maps, calibration_digest,
+                        shared_remapper)
+
+
+@timed('distort_maps')
+def build_distort_maps(intrinsics: dict, P_new: np.ndarray,
+                       size: tuple[int, int], m1type: int = cv2.CV_16SC2,
+                       tile_rows: int = 64,
+                       rows: tuple[int, int] | None = None) -> Maps:
+    """
+    Build the tables that warp a rectified image back to the original
+    fisheye geometry for an image of the given (width, height).
+
+    With the default m1type the maps are fixed-point (CV_16SC2, CV_16UC1),
+    which cv2.remap handles faster; pass cv2.CV_32FC1 for float32 maps.
+    Rows are processed in tiles of tile_rows so temporaries stay small.
+    With rows = (y0, y1) only the maps of output rows y0..y1-1 are built.
+    """
+    w, h = size
+    y_start, y_end = rows if rows is not None else (0, h)
+    h = y_end - y_start
+    K = np.asarray(intrinsics['K'], dtype=np.float64)
+    D = np.asarray(intrinsics['D'], dtype=np.float64)
+    R = np.asarray(intrinsics['R'], dtype=np.float64)
+
+    # A distorted pixel is un-projected to a ray in the ORIGINAL camera frame,
+    # rotated into the RECTIFIED frame (X_rect = R * X_orig) and projected
+    # with K_rect from P_new = [K_rect | Tx]. Folding K_rect @ R into one 3x3
+    # lets fisheye.undistortPoints do all three steps and return rectified
+    # pixel coordinates directly.
+    M = np.asarray(P_new, dtype=np.float64)[:3, :3] @ R
+
+    if m1type == cv2.CV_16SC2:
+        map1 = np.empty((h, w, 2), dtype=np.int16)
+        map2 = np.empty((h, w), dtype=np.uint16)
+    elif m1type == cv2.CV_32FC1:
+        map1 = np.empty((h, w), dtype=np.float32)
+        map2 = np.empty((h, w), dtype=np.float32)
+    else:
+        raise ValueError(f"Unsupported map type: {m1type}")
+
+    xs = np.arange(w, dtype=np.float32)
+    points = np.empty((tile_rows, w, 2), dtype=np.float32)
+    points[:, :, 0] = xs
+    for y0 in range(0, h, tile_rows):
+        n = min(tile_rows, h - y0)
+        tile = points[:n]
+        tile[:, :, 1] = np.arange(y_start + y0, y_start + y0 + n,
+                                  dtype=np.float32)[:, np.newaxis]
+        rectified = cv2.fisheye.undistortPoints(tile.reshape(-1, 1, 2), K, D,
+                                                R=M).reshape(n, w, 2)
+        if m1type == cv2.CV_16SC2:
+            map1[y0:y0 + n], map2[y0:y0 + n] = cv2.convertMaps(
+                rectified, None, cv2.CV_16SC2)
+        else:
+            map1[y0:y0 + n] = rectified[:, :, 0]
+            map2[y0:y0 + n] = rectified[:, :, 1]
+    return map1, map2
+
+
+class Redistorter(CachedRemapper):
+    """
+    Reusable inverse of the rectification. Calling it on a rectified frame
+    only runs cv2.remap, the maps are built once and shared through the cache.
+    """
+    kind = 'distort'
+    version = 2
+
+    def __init__(self, intrinsics: dict, P_new: np.ndarray,
+                 cache: MapCache | None = None,
+                 interpolation: int = cv2.INTER_LINEAR,
+                 output_size: tuple[int, int] | None = None,
+                 strip_rows: int | None = None):
+        super().__init__(cache, interpolation, output_size, strip_rows)
+        self.intrinsics = intrinsics
+        self.P_new = np.asarray(P_new)
+        self._digest = calibration_digest(intrinsics,
+                                          np.asarray(intrinsics['R']),
+                                          self.P_new)
+
+    def build_maps(self, size: tuple[int, int],
+                   rows: tuple[int, int] | None = None) -> Maps:
+        return build_distort_maps(self.intrinsics, self.P_new, size,
+                                  rows=rows)
+
+
+def distort_image(image: np.ndarray, intrinsics: dict, P_new: np.ndarray,
+                  strip_rows: int | None = None,
+                  out: np.ndarray | None = None) -> np.ndarray:
     """
     Distorts a rectified image back to the original fisheye lens geometry.
-    
+
     Args:
         image: The input RECTIFIED image.
         intrinsics: Dict containing 'K', 'D', 'R' of the ORIGINAL fisheye camera.
                     R is the rotation from Original -> Rectified Frame.
         P_new: The 3x4 projection matrix of the RECTIFIED camera.
+        strip_rows: Warp in strips of this many rows to bound memory.
+        out: Preallocated output image, allocated when not given.
     """
-    h, w = image.shape[:2]
-    K = np.array(intrinsics['K'])
-    D = np.array(intrinsics['D'])
-    R = np.array(intrinsics['R'])
-    
-    # 1. Create grid for the DESTINATION (Distorted) image
-    # These are the pixels (u,v) in the final fisheye image
-    grid_x, grid_y = np.meshgrid(np.arange(w), np.arange(h))
-    distorted_points = np.stack([grid_x, grid_y], axis=-1).reshape(-1, 1, 2).astype(np.float32)
-
-    # 2. Un-project distorted pixels to 3D rays in the ORIGINAL Camera Frame
-    # undistortPoints with default R=Eye, P=Eye returns normalized coordinates (x, y)
-    # on the plane z=1 in the original camera frame.
-    undistorted_norm = cv2.fisheye.undistortPoints(distorted_points, K, D)
-    
-    # Convert to Homogeneous 3D vectors (x, y, 1)
-    # Shape: (N, 3)
-    vectors_orig = np.concatenate([undistorted_norm.reshape(-1, 2), np.ones((h*w, 1))], axis=1)
-
-    # 3. Rotate rays from ORIGINAL Frame to RECTIFIED Frame
-    # X_rect = R * X_orig
-    # We transpose vectors_orig to (3, N) for matrix mult, then transpose back
-    vectors_rect = (R @ vectors_orig.T).T
-
-    # 4. Project these 3D rays onto the RECTIFIED Image Plane
-    # P_new usually has the form [K_rect | Tx]. We only need K_rect for projection.
-    K_rect = P_new[:3, :3]
-    
-    # Project: uv_homo = K_rect * vectors_rect
-    rectified_pixels_homo = (K_rect @ vectors_rect.T).T
-    
-    # Normalize by Z to get pixel coordinates (u, v)
-    map_x = rectified_pixels_homo[:, 0] / rectified_pixels_homo[:, 2]
-    map_y = rectified_pixels_homo[:, 1] / rectified_pixels_homo[:, 2]
-
-    # 5. Reshape and Remap
-    map_x = map_x.reshape(h, w).astype(np.float32)
-    map_y = map_y.reshape(h, w).astype(np.float32)
-
     # We use INTER_LINEAR or INTER_CUBIC. BORDER_CONSTANT is safe for out-of-bounds.
-    redistorted_image = cv2.remap(image, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
-
-    return redistorted_image
+    redistorter = shared_remapper(Redistorter(intrinsics, P_new,
+                                              strip_rows=strip_rows))
+    return redistorter(image, out)
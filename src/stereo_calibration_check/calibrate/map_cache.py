@@ -0,0 +1,294 @@
+"""
+Caching of remap tables so per-frame work reduces to a single cv2.remap.
+"""
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+import hashlib
+import os
+import tempfile
+import threading
+import warnings
+
+import cv2
+import numpy as np
+
+from ..utils.profiling import span
+
+Maps = tuple[np.ndarray, np.ndarray]
+
+
+def array_digest(*arrays: np.ndarray) -> str:
+    """
+    Return a stable hex digest of the shapes, dtypes and contents of arrays.
+    """
+    h = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        h.update(str((array.shape, array.dtype.str)).encode())
+        h.update(array.tobytes())
+    return h.hexdigest()
+
+
+def calibration_digest(intrinsics: dict, *arrays: np.ndarray) -> str:
+    """
+    Return a digest identifying a camera calibration plus extra parameters.
+
+    Hashes K, D, R, P and the image size of the calibration, together with
+    the hash of the calibration YAML recorded by load_intrinsics when
+    present, so an edited copy of a loaded calibration gets its own maps.
+    """
+    values = [np.asarray(intrinsics[name], dtype=np.float64)
+              for name in ('K', 'D', 'R', 'P', 'width', 'height')
+              if name in intrinsics]
+    if 'sha256' in intrinsics:
+        values.append(np.frombuffer(intrinsics['sha256'].encode(),
+                                    dtype=np.uint8))
+    return array_digest(*values, *arrays)
+
+
+def default_cache_dir() -> str:
+    """
+    Return the default on-disk map cache directory.
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME',
+                                os.path.join(os.path.expanduser('~'),
+                                             '.cache'))
+    return os.path.join(cache_home, 'stereo_calibration_check', 'maps')
+
+
+class MapCache:
+    """
+    Bounded, thread-safe LRU cache of remap tables keyed by calibration.
+
+    When cache_dir is set, built maps are also persisted there as .npy files
+    and later loaded memory-mapped, so new processes skip map construction
+    and share the same pages. If cache_dir cannot be written, a warning is
+    issued and the cache keeps working in memory only.
+    """
+
+    def __init__(self, maxsize: int = 8, cache_dir: str | None = None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._maps: OrderedDict[Hashable, Maps] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._maps)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._maps
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], Maps]) -> Maps:
+        """
+        Return the maps stored under key, calling builder() on a miss.
+        """
+        with self._lock:
+            maps = self._maps.get(key)
+            if maps is not None:
+                self._maps.move_to_end(key)
+                return maps
+
+        # Build outside the lock, map construction can take a while.
+        maps = self.load_or_build(key, builder)
+
+        with self._lock:
+            self._maps[key] = maps
+            self._maps.move_to_end(key)
+            while len(self._maps) > self.maxsize:
+                self._maps.popitem(last=False)
+        return maps
+
+    def load_or_build(self, key: Hashable, builder: Callable[[], Maps]
+                      ) -> Maps:
+        """
+        Return the maps persisted under key, calling builder() and persisting
+        the result when there are none, without keeping them in memory.
+        """
+        maps = self._load(key)
+        if maps is None:
+            maps = builder()
+            self._save(key, maps)
+            # Swap the built arrays for their file-backed memory-mapped copy
+            # once persisted.
+            maps = self._load(key) or maps
+        return maps
+
+    def clear(self) -> None:
+        with self._lock:
+            self._maps.clear()
+
+    def _paths(self, key: Hashable) -> tuple[str, str]:
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return (os.path.join(self.cache_dir, f'{name}_map1.npy'),
+                os.path.join(self.cache_dir, f'{name}_map2.npy'))
+
+    def _load(self, key: Hashable) -> Maps | None:
+        if self.cache_dir is None:
+            return None
+        path1, path2 = self._paths(key)
+        try:
+            return (np.load(path1, mmap_mode='r'),
+                    np.load(path2, mmap_mode='r'))
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key: Hashable, maps: Maps) -> None:
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for path, array in zip(self._paths(key), maps):
+                self._write(path, array)
+        except OSError as e:
+            warnings.warn(f"Cannot write remap tables to {self.cache_dir} "
+                          f"({e}), keeping them in memory only",
+                          RuntimeWarning, stacklevel=2)
+            self.cache_dir = None
+
+    def _write(self, path: str, array: np.ndarray) -> None:
+        # Write to a temporary file first so concurrent readers never see a
+        # partially written map.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                np.save(file, array)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+default_map_cache = MapCache()
+
+
+class CachedRemapper:
+    """
+    Base class for objects that warp frames with cached remap tables.
+
+    Subclasses set self._digest to identify their calibration and implement
+    build_maps(size, rows). Maps are built once per (calibration, size) key.
+    The output has the size of the input frame unless output_size is given.
+
+    With strip_rows, frames are warped in horizontal strips of that many
+    output rows, each with its own maps, so building maps never needs
+    frame-sized temporaries. The strip maps of the current size are kept on
+    the remapper itself rather than in the shared LRU, which holds far fewer
+    entries than a frame has strips. When the cache has a cache_dir they are
+    persisted there and kept memory-mapped, so they take no heap memory.
+    """
+    kind = 'remap'
+    # Bump when the layout of the built maps changes so stale on-disk
+    # entries are not picked up.
+    version = 1
+
+    def __init__(self, cache: MapCache | None = None,
+                 interpolation: int = cv2.INTER_LINEAR,
+                 output_size: tuple[int, int] | None = None,
+                 strip_rows: int | None = None):
+        self.cache = cache if cache is not None else default_map_cache
+        self.interpolation = interpolation
+        self.output_size = output_size
+        self.strip_rows = strip_rows
+        self._digest = ''
+        self._size = None
+        self._maps = None
+        self._strip_size = None
+        self._strip_maps: dict[tuple[int, int], Maps] = {}
+
+    def build_maps(self, size: tuple[int, int],
+                   rows: tuple[int, int] | None = None) -> Maps:
+        """
+        Build fixed-point maps for an output of the given (width, height),
+        only for output rows [rows[0], rows[1]) when rows is given.
+        """
+        raise NotImplementedError
+
+    def maps(self, size: tuple[int, int],
+             rows: tuple[int, int] | None = None) -> Maps:
+        """
+        Return the remap tables for an image of the given (width, height),
+        or for the strip of output rows [rows[0], rows[1]) of it.
+        """
+        if rows is not None:
+            if self._strip_size != size:
+                self._strip_maps = {}
+                self._strip_size = size
+            maps = self._strip_maps.get(rows)
+            if maps is None:
+                key = (self.kind, self.version, self._digest, size, rows)
+                maps = self._strip_maps[rows] = self.cache.load_or_build(
+                    key, lambda: self.build_maps(size, rows))
+            return maps
+        if self._size != size:
+            key = (self.kind, self.version, self._digest, size)
+            self._maps = self.cache.get_or_build(
+                key, lambda: self.build_maps(size))
+            self._size = size
+        return self._maps
+
+    def strips(self, size: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        Return the output row ranges warped separately for an output of the
+        given (width, height), a single full range without strip_rows.
+        """
+        step = self.strip_rows or size[1]
+        return [(y0, min(y0 + step, size[1])) for y0 in range(0, size[1], step)]
+
+    def prepare(self, size: tuple[int, int]) -> None:
+        """
+        Build (or load) every map needed for an output of the given
+        (width, height) so no frame pays for them.
+        """
+        if self.strip_rows is None:
+            self.maps(size)
+            return
+        for rows in self.strips(size):
+            self.maps(size, rows)
+
+    def __call__(self, frame: np.ndarray,
+                 out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Warp frame into out, allocated when not given, and return out.
+        """
+        h, w = frame.shape[:2]
+        size = self.output_size or (w, h)
+        if out is None:
+            out = np.empty((size[1], size[0]) + frame.shape[2:], frame.dtype)
+        if self.strip_rows is None:
+            map1, map2 = self.maps(size)
+            with span('remap'):
+                cv2.remap(frame, map1, map2, self.interpolation, dst=out,
+                          borderMode=cv2.BORDER_CONSTANT,
+                          borderValue=(0, 0, 0))
+            return out
+
+        for rows in self.strips(size):
+            map1, map2 = self.maps(size, rows)
+            with span('remap'):
+                cv2.remap(frame, map1, map2, self.interpolation,
+                          dst=out[rows[0]:rows[1]],
+                          borderMode=cv2.BORDER_CONSTANT,
+                          borderValue=(0, 0, 0))
+        return out
+
+
+_shared_remappers: OrderedDict[Hashable, CachedRemapper] = OrderedDict()
+_shared_lock = threading.Lock()
+
+
+def shared_remapper(remapper: CachedRemapper,
+                    maxsize: int = 8) -> CachedRemapper:
+    """
+    Return an earlier remapper equivalent to remapper, or remapper itself
+    the first time, so one-off calls reuse its strip maps across frames.
+    """
+    key = (type(remapper), remapper.version, remapper._digest,
+           remapper.interpolation, remapper.output_size, remapper.strip_rows,
+           id(remapper.cache))
+    with _shared_lock:
+        remapper = _shared_remappers.setdefault(key, remapper)
+        _shared_remappers.move_to_end(key)
+        while len(_shared_remappers) > maxsize:
+            _shared_remappers.popitem(last=False)
+    return remapper
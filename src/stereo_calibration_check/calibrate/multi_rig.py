@@ -0,0 +1,76 @@
+"""
+Rigs of more than two cameras, checked pair by pair.
+
+A rig file lists the camera calibration files and the camera pairs to check:
+
+    cameras:
+      cam0: cam0.yaml
+      cam1: cam1.yaml
+      cam2: cam2.yaml
+    pairs:
+      - left: cam0
+        right: cam1
+        R: [1, 0, 0, 0, 1, 0, 0, 0, 1]
+        T: [0.12, 0, 0]
+      - left: cam1
+        right: cam2
+
+Relative paths are resolved against the rig file. R and T map points from
+the left to the right camera frame and default to the nominal extrinsics.
+Without pairs, every combination of cameras is checked in the listed order.
+"""
+from dataclasses import dataclass
+from itertools import combinations
+import os
+
+import numpy as np
+
+from ..utils.file_utils import load_yaml
+from .registry import CameraCalibration, RigCalibration
+
+
+def pair_name(left: str, right: str) -> str:
+    return f'{left}-{right}'
+
+
+@dataclass(frozen=True)
+class MultiCameraRig:
+    """
+    Calibrations of the cameras of a rig and the precomputed rectification
+    of each configured pair. Pairs are keyed by pair_name(left, right) and
+    pair_cameras maps those keys back to (left, right) camera names.
+    """
+    cameras: dict[str, CameraCalibration]
+    pairs: dict[str, RigCalibration]
+    pair_cameras: dict[str, tuple[str, str]]
+
+    @classmethod
+    def from_file(cls, path: str) -> 'MultiCameraRig':
+        config = load_yaml(path)
+        base = os.path.dirname(path)
+        cameras = {
+            name: CameraCalibration.from_file(os.path.join(base, calib))
+            for name, calib in config['cameras'].items()
+        }
+        pair_configs = config.get('pairs') or [
+            {'left': left, 'right': right}
+            for left, right in combinations(cameras, 2)
+        ]
+
+        pairs = {}
+        pair_cameras = {}
+        for pair in pair_configs:
+            left, right = pair['left'], pair['right']
+            for camera in (left, right):
+                if camera not in cameras:
+                    raise ValueError(f"Pair {left}-{right} of {path} uses "
+                                     f"unknown camera '{camera}'")
+            R = pair.get('R')
+            T = pair.get('T')
+            name = pair_name(left, right)
+            pair_cameras[name] = (left, right)
+            pairs[name] = RigCalibration.from_cameras(
+                name, cameras[left], cameras[right],
+                None if R is None else np.reshape(R, (3, 3)),
+                None if T is None else np.reshape(T, (3, 1)))
+        return cls(cameras, pairs, pair_cameras)
@@ -0,0 +1,239 @@
+"""
+Online refinement of the stereo extrinsics from matches accumulated while
+the pipeline runs.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+from .map_cache import MapCache
+from .stereo_calibrate import DEFAULT_R, DEFAULT_T, get_projection_matrix
+from .undistort import Rectifier
+
+
+def rotation_angle(R: np.ndarray) -> float:
+    """
+    Return the rotation angle of R in degrees.
+    """
+    cos = np.clip((np.trace(R) - 1) / 2, -1.0, 1.0)
+    return float(np.degrees(np.arccos(cos)))
+
+
+def vector_angle(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Return the angle between two vectors in degrees.
+    """
+    a = np.ravel(a)
+    b = np.ravel(b)
+    cos = np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.degrees(np.arccos(np.clip(cos, -1.0, 1.0))))
+
+
+def rectified_to_normalized(pts: np.ndarray, R_rect: np.ndarray,
+                            P_rect: np.ndarray) -> np.ndarray:
+    """
+    Map pixels of a rectified image to normalized coordinates (x/z, y/z) in
+    the original camera frame, undoing the rectification rotation.
+    """
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    rays = np.column_stack([pts, np.ones(len(pts))])
+    # X_rect = R_rect * X_orig, and pixels are K_rect * X_rect.
+    M = np.linalg.inv(P_rect[:3, :3] @ R_rect)
+    rays = rays @ M.T
+    return rays[:, :2] / rays[:, 2:]
+
+
+class OnlineRecalibrator:
+    """
+    Incremental estimator of the relative rotation and baseline direction.
+
+    Inlier matches of the rectified pair are converted to rays in the
+    original camera frames, so they stay valid across updates, and kept in a
+    fixed-size reservoir sample. Every update_every new matches the relative
+    pose is re-estimated with a robust essential matrix fit. stereoRectify is
+    only re-run, and new rectifiers only built, when the rotation or the
+    baseline direction moved by more than angle_threshold degrees.
+
+    Safe to share between threads: the maps of new rectifiers are built
+    before they replace the current ones, and matches of pairs rectified
+    before an update are dropped (see current and add_matches).
+    """
+
+    def __init__(self, intrinsics1: dict, intrinsics2: dict,
+                 R: np.ndarray | None = None, T: np.ndarray | None = None,
+                 reservoir_size: int = 4000, update_every: int = 500,
+                 min_matches: int = 200, angle_threshold: float = 0.1,
+                 ransac_threshold: float = 1.0,
+                 cache: MapCache | None = None,
+                 strip_rows: int | None = None, seed: int = 0):
+        self.intrinsics1 = intrinsics1
+        self.intrinsics2 = intrinsics2
+        self.R = DEFAULT_R if R is None else np.asarray(R, dtype=np.float64)
+        self.T = (DEFAULT_T if T is None else
+                  np.asarray(T, dtype=np.float64)).reshape(3, 1)
+        self.reservoir_size = reservoir_size
+        self.update_every = update_every
+        self.min_matches = min_matches
+        self.angle_threshold = angle_threshold
+        # RANSAC threshold in pixels, converted to normalized coordinates.
+        self._threshold = ransac_threshold / np.mean(
+            [intrinsics1['K'][0, 0], intrinsics2['K'][0, 0]])
+        self.cache = cache
+        self.strip_rows = strip_rows
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        self._rays1 = np.empty((reservoir_size, 2))
+        self._rays2 = np.empty((reservoir_size, 2))
+        self._seen = 0
+        self._since_update = 0
+        self._updating = False
+        self.num_updates = 0
+        self._set_rectification(self.R, self.T,
+                                self._rectification(self.R, self.T))
+
+    @property
+    def num_samples(self) -> int:
+        return min(self._seen, self.reservoir_size)
+
+    def _rectification(self, R: np.ndarray, T: np.ndarray) -> tuple:
+        R1, R2, P1, P2 = get_projection_matrix(
+            self.intrinsics1, self.intrinsics2, R, T)
+        rectifiers = (
+            Rectifier(self.intrinsics1, R1, P1, cache=self.cache,
+                      strip_rows=self.strip_rows),
+            Rectifier(self.intrinsics2, R2, P2, cache=self.cache,
+                      strip_rows=self.strip_rows))
+        for rectifier, intrinsics in zip(rectifiers, (self.intrinsics1,
+                                                      self.intrinsics2)):
+            rectifier.prepare((intrinsics['width'], intrinsics['height']))
+        return R1, R2, P1, P2, rectifiers
+
+    def _set_rectification(self, R: np.ndarray, T: np.ndarray,
+                           rectification: tuple) -> None:
+        self.R = R
+        self.T = T
+        self.R1, self.R2, self.P1, self.P2, self.rectifiers = rectification
+
+    def current(self) -> tuple[int, tuple[Rectifier, Rectifier]]:
+        """
+        Return the number of updates so far and the current rectifiers, to
+        rectify a pair with and hand back to add_matches with its matches.
+        """
+        with self._lock:
+            return self.num_updates, self.rectifiers
+
+    def rectify(self, img1: np.ndarray,
+                img2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Rectify a raw pair with the current extrinsics.
+        """
+        rectifier1, rectifier2 = self.rectifiers
+        return rectifier1(img1), rectifier2(img2)
+
+    def _sample(self, rays1: np.ndarray, rays2: np.ndarray) -> None:
+        # Reservoir sampling (algorithm R) over the whole batch at once.
+        n = len(rays1)
+        positions = self._seen + np.arange(n)
+        slots = positions.copy()
+        full = positions >= self.reservoir_size
+        slots[full] = self._rng.integers(0, positions[full] + 1)
+        keep = slots < self.reservoir_size
+        self._rays1[slots[keep]] = rays1[keep]
+        self._rays2[slots[keep]] = rays2[keep]
+        self._seen += n
+
+    def add_matches(self, pts1: np.ndarray, pts2: np.ndarray,
+                    version: int | None = None) -> bool:
+        """
+        Add inlier matches of a pair rectified with the current extrinsics.
+        version is the number of updates returned by current() with the
+        rectifiers the pair was rectified with; the matches are dropped
+        when an update happened since. Returns True when this triggered a
+        rectification update.
+        """
+        if len(pts1) == 0:
+            return False
+        with self._lock:
+            if version is not None and version != self.num_updates:
+                return False
+            self._sample(rectified_to_normalized(pts1, self.R1, self.P1),
+                         rectified_to_normalized(pts2, self.R2, self.P2))
+            self._since_update += len(pts1)
+            if (self._since_update < self.update_every or
+                    self.num_samples < self.min_matches or self._updating):
+                return False
+            self._since_update = 0
+            self._updating = True
+            rays = self._snapshot()
+
+        # Fit and build the new maps outside the lock, other threads keep
+        # adding matches and rectifying with the current maps meanwhile.
+        # Only this thread changes R and T while _updating is set.
+        try:
+            pose = self._refine(*rays)
+            rectification = (self._rectification(*pose) if pose is not None
+                             else None)
+        except BaseException:
+            with self._lock:
+                self._updating = False
+            raise
+        with self._lock:
+            if rectification is not None:
+                self._set_rectification(*pose, rectification)
+                self.num_updates += 1
+            self._updating = False
+        return rectification is not None
+
+    def _snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        n = self.num_samples
+        return self._rays1[:n].copy(), self._rays2[:n].copy()
+
+    def estimate(self, rays1: np.ndarray | None = None,
+                 rays2: np.ndarray | None = None
+                 ) -> tuple[np.ndarray, np.ndarray, int] | None:
+        """
+        Estimate (R, unit t, number of inliers) from the given rays, by
+        default a snapshot of the reservoir, or None when the fit fails.
+        """
+        if rays1 is None:
+            with self._lock:
+                rays1, rays2 = self._snapshot()
+        if len(rays1) < 5:
+            return None
+        E, mask = cv2.findEssentialMat(rays1, rays2, np.eye(3),
+                                       method=cv2.USAC_MAGSAC, prob=0.999,
+                                       threshold=self._threshold)
+        if E is None or E.shape != (3, 3):
+            return None
+        # Count the inliers of the essential matrix fit. The cheirality count
+        # of recoverPose collapses for distant points without parallax, it is
+        # only used to pick the decomposition of E.
+        inliers = int(mask.sum())
+        _, R, t, _ = cv2.recoverPose(E, rays1, rays2, np.eye(3),
+                                     mask=mask.copy())
+        return R, t, inliers
+
+    def _refine(self, rays1: np.ndarray, rays2: np.ndarray
+                ) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Return the (R, T) re-estimated from the rays when it moved by more
+        than angle_threshold, None otherwise.
+        """
+        estimate = self.estimate(rays1, rays2)
+        if estimate is None:
+            return None
+        R, t, inliers = estimate
+        if inliers < self.min_matches:
+            return None
+        # The essential matrix only fixes the direction up to sign, keep the
+        # sign and the length of the current baseline.
+        if np.dot(t.ravel(), self.T.ravel()) < 0:
+            t = -t
+        T = t / np.linalg.norm(t) * np.linalg.norm(self.T)
+
+        if (rotation_angle(R @ self.R.T) <= self.angle_threshold and
+                vector_angle(T, self.T) <= self.angle_threshold):
+            return None
+        return R, T
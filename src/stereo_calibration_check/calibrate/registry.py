@@ -0,0 +1,221 @@
+"""
+Registry of the stereo rig calibrations of a directory.
+
+Each rig is described by <rig>_left.yaml and <rig>_right.yaml camera files
+and an optional <rig>_extrinsics.yaml holding the rotation R and translation
+T from the left to the right camera (rows/cols/data like the camera files);
+without it the nominal rig extrinsics are used.
+"""
+from dataclasses import dataclass, fields
+import glob
+import os
+import threading
+
+import numpy as np
+
+from ..utils.file_utils import load_yaml, parse_intrinsics
+from .map_cache import MapCache
+from .stereo_calibrate import DEFAULT_R, DEFAULT_T, get_projection_matrix
+from .undistort import Rectifier
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array = np.array(array, dtype=np.float64)
+    array.flags.writeable = False
+    return array
+
+
+class _Record:
+    """
+    Frozen dataclass mixin making array fields read-only, also after
+    unpickling in a worker process.
+    """
+
+    def __post_init__(self):
+        self._freeze()
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._freeze()
+
+    def _freeze(self) -> None:
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, np.ndarray) and value.flags.writeable:
+                object.__setattr__(self, f.name, _readonly(value))
+
+
+@dataclass(frozen=True)
+class CameraCalibration(_Record):
+    """
+    Intrinsics of one camera. Supports intrinsics['K'] style access, so it
+    can be passed wherever a load_intrinsics dict is expected.
+    """
+    K: np.ndarray
+    D: np.ndarray
+    R: np.ndarray
+    P: np.ndarray
+    width: int
+    height: int
+    sha256: str
+    path: str = ''
+    mtime: float = 0.0
+
+    @classmethod
+    def from_file(cls, path: str) -> 'CameraCalibration':
+        mtime = os.stat(path).st_mtime
+        with open(path, 'rb') as file:
+            data = parse_intrinsics(file.read())
+        return cls(**data, path=path, mtime=mtime)
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+
+@dataclass(frozen=True)
+class RigCalibration(_Record):
+    """
+    Calibration of a stereo rig with its precomputed fisheye rectification.
+    """
+    name: str
+    left: CameraCalibration
+    right: CameraCalibration
+    R: np.ndarray
+    T: np.ndarray
+    R1: np.ndarray
+    R2: np.ndarray
+    P1: np.ndarray
+    P2: np.ndarray
+    extrinsics_path: str | None = None
+    extrinsics_mtime: float = 0.0
+
+    @classmethod
+    def from_cameras(cls, name: str, left: CameraCalibration,
+                     right: CameraCalibration, R: np.ndarray | None = None,
+                     T: np.ndarray | None = None, **kwargs
+                     ) -> 'RigCalibration':
+        R = DEFAULT_R if R is None else np.asarray(R, dtype=np.float64)
+        T = DEFAULT_T if T is None else np.asarray(T, dtype=np.float64)
+        T = T.reshape(3, 1)
+        R1, R2, P1, P2 = get_projection_matrix(left, right, R, T)
+        return cls(name, left, right, R, T, R1, R2, P1, P2, **kwargs)
+
+    @classmethod
+    def from_files(cls, left_path: str, right_path: str,
+                   extrinsics_path: str | None = None,
+                   name: str = '') -> 'RigCalibration':
+        R = T = None
+        kwargs = {}
+        if extrinsics_path is not None:
+            kwargs = dict(extrinsics_path=extrinsics_path,
+                          extrinsics_mtime=os.stat(extrinsics_path).st_mtime)
+            extrinsics = load_yaml(extrinsics_path)
+            R = np.reshape(extrinsics['R']['data'], (3, 3))
+            T = np.reshape(extrinsics['T']['data'], (3, 1))
+        return cls.from_cameras(name, CameraCalibration.from_file(left_path),
+                                CameraCalibration.from_file(right_path), R, T,
+                                **kwargs)
+
+    def sources(self) -> dict[str, float]:
+        """
+        Return the files this rig was loaded from and their mtimes.
+        """
+        sources = {self.left.path: self.left.mtime,
+                   self.right.path: self.right.mtime}
+        if self.extrinsics_path is not None:
+            sources[self.extrinsics_path] = self.extrinsics_mtime
+        return sources
+
+    def is_stale(self) -> bool:
+        """
+        True when a source file changed or disappeared since loading.
+        """
+        for path, mtime in self.sources().items():
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    def rectifiers(self, cache: MapCache | None = None,
+                   strip_rows: int | None = None
+                   ) -> tuple[Rectifier, Rectifier]:
+        return (Rectifier(self.left, self.R1, self.P1, cache=cache,
+                          strip_rows=strip_rows),
+                Rectifier(self.right, self.R2, self.P2, cache=cache,
+                          strip_rows=strip_rows))
+
+
+class CalibrationRegistry:
+    """
+    Rig calibrations of a directory, parsed once and reloaded only when one
+    of their files changes.
+
+    get() compares the mtimes of the rig's files against the loaded record,
+    so edits are picked up without rescanning; refresh() rescans the
+    directory for added or removed rigs. Records are immutable and can be
+    shared between threads or sent to worker processes as they are.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._rigs: dict[str, RigCalibration] = {}
+        self._paths: dict[str, tuple[str, str, str | None]] = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _scan(self) -> dict[str, tuple[str, str, str | None]]:
+        paths = {}
+        for left in glob.glob(os.path.join(self.directory, '*_left.yaml')):
+            prefix = left[:-len('_left.yaml')]
+            right = prefix + '_right.yaml'
+            if not os.path.exists(right):
+                continue
+            extrinsics = prefix + '_extrinsics.yaml'
+            paths[os.path.basename(prefix)] = (
+                left, right, extrinsics if os.path.exists(extrinsics) else None)
+        return paths
+
+    def refresh(self) -> None:
+        """
+        Rescan the directory, dropping rigs whose set of files changed.
+        """
+        paths = self._scan()
+        with self._lock:
+            self._rigs = {name: rig for name, rig in self._rigs.items()
+                          if paths.get(name) == self._paths.get(name)}
+            self._paths = paths
+
+    def names(self) -> list[str]:
+        return sorted(self._paths)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._paths
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def get(self, name: str) -> RigCalibration:
+        """
+        Return the calibration of rig name, loading it on first use or when
+        its files changed. Raises KeyError for unknown rigs.
+        """
+        with self._lock:
+            rig = self._rigs.get(name)
+            if rig is not None and not rig.is_stale():
+                return rig
+            if name not in self._paths:
+                raise KeyError(f"Unknown rig '{name}' in {self.directory}")
+            rig = RigCalibration.from_files(*self._paths[name], name=name)
+            self._rigs[name] = rig
+            return rig
+
+    def __getitem__(self, name: str) -> RigCalibration:
+        return self.get(name)
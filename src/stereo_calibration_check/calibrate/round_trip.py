@@ -0,0 +1,189 @@
+"""
+Numeric distort -> re-rectify round trip consistency.
+
+Distorting a rectified image back to the fisheye geometry and rectifying it
+again should reproduce it. The two remap tables are composed into one, so
+the round trip of a frame costs a single remap, and the geometric error of
+the composition is known without looking at any frame.
+"""
+from dataclasses import dataclass, field, fields
+import math
+
+import cv2
+import numpy as np
+
+from ..utils.profiling import timed
+from .distort import build_distort_maps
+from .map_cache import CachedRemapper, MapCache, Maps, calibration_digest
+
+# Map value of output pixels without a round trip source.
+INVALID = -1.0
+
+
+@timed('round_trip_maps')
+def build_round_trip_maps(intrinsics: dict, P_new: np.ndarray,
+                          size: tuple[int, int]) -> Maps:
+    """
+    Build float32 maps taking each pixel of a rectified image of the given
+    (width, height) to where the distort -> rectify round trip samples it.
+    Pixels whose round trip leaves either image are set to INVALID.
+    """
+    w, h = size
+    K = np.asarray(intrinsics['K'], dtype=np.float64)
+    D = np.asarray(intrinsics['D'], dtype=np.float64)
+    R = np.asarray(intrinsics['R'], dtype=np.float64)
+    P_new = np.asarray(P_new, dtype=np.float64)
+
+    # rectified pixel -> distorted pixel
+    rect_x, rect_y = cv2.fisheye.initUndistortRectifyMap(K, D, R, P_new, size,
+                                                         cv2.CV_32FC1)
+    # distorted pixel -> rectified pixel
+    dist_x, dist_y = build_distort_maps(intrinsics, P_new, size,
+                                        m1type=cv2.CV_32FC1)
+    # Composition: sample the distort maps where rectification reads.
+    map_x = cv2.remap(dist_x, rect_x, rect_y, cv2.INTER_LINEAR,
+                      borderMode=cv2.BORDER_CONSTANT, borderValue=INVALID)
+    map_y = cv2.remap(dist_y, rect_x, rect_y, cv2.INTER_LINEAR,
+                      borderMode=cv2.BORDER_CONSTANT, borderValue=INVALID)
+
+    valid = ((rect_x >= 0) & (rect_x <= w - 1) &
+             (rect_y >= 0) & (rect_y <= h - 1) &
+             (map_x >= 0) & (map_x <= w - 1) &
+             (map_y >= 0) & (map_y <= h - 1))
+    map_x[~valid] = INVALID
+    map_y[~valid] = INVALID
+    return map_x, map_y
+
+
+def region_sums(values: np.ndarray, grid: tuple[int, int]) -> np.ndarray:
+    """
+    Return the sum of values in each cell of a cols x rows grid.
+    """
+    cols, rows = grid
+    h, w = values.shape[:2]
+    ys = np.linspace(0, h, rows + 1).astype(int)[:-1]
+    xs = np.linspace(0, w, cols + 1).astype(int)[:-1]
+    sums = np.add.reduceat(values, ys, axis=0, dtype=np.int64)
+    return np.add.reduceat(sums, xs, axis=1)
+
+
+def json_record(values: dict) -> dict:
+    """
+    Return values with floats and arrays of floats made JSON-friendly, NaN
+    becomes None and arrays are rounded to nested lists.
+    """
+    record = {}
+    for name, value in values.items():
+        if isinstance(value, np.ndarray):
+            value = [[None if math.isnan(v) else round(float(v), 3)
+                      for v in row] for row in value]
+        elif isinstance(value, float) and math.isnan(value):
+            value = None
+        record[name] = value
+    return record
+
+
+@dataclass(frozen=True)
+class RoundTripError:
+    """
+    Round trip consistency of one frame.
+
+    mean_error / max_error - absolute intensity error over the valid pixels
+    mean_shift / max_shift - geometric error of the composed maps in pixels
+    valid_ratio - fraction of pixels that survive the round trip
+    region_error - mean intensity error per grid region, NaN without valid
+                   pixels
+    """
+    mean_error: float
+    max_error: float
+    mean_shift: float
+    max_shift: float
+    valid_ratio: float
+    region_error: np.ndarray = field(repr=False, compare=False)
+
+    def as_dict(self) -> dict:
+        """
+        Return the statistics and the region errors as a JSON-friendly dict,
+        NaN becomes None.
+        """
+        return json_record({f.name: getattr(self, f.name)
+                            for f in fields(self)})
+
+
+class RoundTripCheck(CachedRemapper):
+    """
+    Measures the distort -> re-rectify round trip of rectified frames with
+    one remap through the composed maps.
+
+    The round trip uses the rectification of the calibration file itself
+    (its R and P unless P_new is given). Calling the check returns the
+    round-tripped frame; check() returns the error statistics.
+    """
+    kind = 'roundtrip'
+
+    def __init__(self, intrinsics: dict, P_new: np.ndarray | None = None,
+                 cache: MapCache | None = None,
+                 interpolation: int = cv2.INTER_LINEAR,
+                 grid: tuple[int, int] = (8, 6)):
+        super().__init__(cache, interpolation)
+        self.intrinsics = intrinsics
+        self.P_new = np.asarray(intrinsics['P'] if P_new is None else P_new)
+        self.grid = grid
+        self._digest = calibration_digest(intrinsics,
+                                          np.asarray(intrinsics['R']),
+                                          self.P_new)
+        self._geometry = {}
+        self._region_counts = {}
+
+    def build_maps(self, size: tuple[int, int],
+                   rows: tuple[int, int] | None = None) -> Maps:
+        if rows is not None:
+            raise ValueError("Round trip maps are not built in strips")
+        return build_round_trip_maps(self.intrinsics, self.P_new, size)
+
+    def geometry(self, size: tuple[int, int]
+                 ) -> tuple[np.ndarray, float, float, float]:
+        """
+        Return the valid mask (uint8), the mean and max geometric error and
+        the valid ratio of the composed maps, computed once per size.
+        """
+        if size not in self._geometry:
+            map_x, map_y = self.maps(size)
+            valid = map_x != INVALID
+            u, v = np.meshgrid(np.arange(size[0], dtype=np.float32),
+                               np.arange(size[1], dtype=np.float32))
+            shift = np.hypot(map_x - u, map_y - v)[valid]
+            if shift.size:
+                stats = (float(shift.mean()), float(shift.max()))
+            else:
+                stats = (float('nan'), float('nan'))
+            mask = valid.astype(np.uint8)
+            self._geometry[size] = (mask, *stats, float(valid.mean()))
+            self._region_counts[size] = region_sums(mask, self.grid)
+        return self._geometry[size]
+
+    def check(self, frame: np.ndarray) -> RoundTripError:
+        """
+        Round trip a rectified frame and measure how far it is from the
+        original.
+        """
+        h, w = frame.shape[:2]
+        mask, mean_shift, max_shift, valid_ratio = self.geometry((w, h))
+        error = cv2.absdiff(frame, self(frame))
+        if error.ndim == 3:
+            error = error.max(axis=2)
+        # Zero the pixels without a round trip so the sums skip them.
+        error = cv2.multiply(error, mask)
+        counts = self._region_counts[(w, h)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            region_error = np.where(counts > 0,
+                                    region_sums(error, self.grid) / counts,
+                                    np.nan)
+        if counts.sum():
+            mean_error = float(region_sums(error, (1, 1))[0, 0] /
+                               counts.sum())
+            max_error = float(error.max())
+        else:
+            mean_error = max_error = float('nan')
+        return RoundTripError(mean_error, max_error, mean_shift, max_shift,
+                              valid_ratio, region_error)
@@ -2,11 +2,19 @@ import cv2
 import numpy as np
 
 
+DEFAULT_R = np.eye(3)
+DEFAULT_T = np.array([[0.12], [0], [0]])
+
+
 def get_projection_matrix(
-    intrinsics1: dict, intrinsics2: dict
+    intrinsics1: dict, intrinsics2: dict,
+    R: np.ndarray | None = None, T: np.ndarray | None = None
 ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
     Get the projection matrices for stereo rectification from two calibration files.
+
+    R and T map points from the first to the second camera frame and default
+    to the nominal rig extrinsics.
     """
     K1 = intrinsics1['K']
     D1 = intrinsics1['D']
@@ -15,8 +23,8 @@ def get_projection_matrix(
     w = intrinsics1['width']
     h = intrinsics1['height']
 
-    R = np.eye(3)
-    T = np.array([[0.12], [0], [0]])
+    R = DEFAULT_R if R is None else np.asarray(R, dtype=np.float64)
+    T = DEFAULT_T if T is None else np.asarray(T, dtype=np.float64).reshape(3, 1)
     R1, R2, P1, P2, Q = cv2.fisheye.stereoRectify(
         K1,
         D1,
@@ -27,3 +35,14 @@ def get_projection_matrix(
         flags=cv2.CALIB_ZERO_DISPARITY,
         balance=0.0)
     return R1, R2, P1, P2
+
+
+def scale_projection(P: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Scale a 3x3 or 3x4 projection matrix for an image resized by scale,
+    keeping pixel centers aligned.
+    """
+    S = np.array([[scale, 0, 0.5 * scale - 0.5],
+                  [0, scale, 0.5 * scale - 0.5],
+                  [0, 0, 1]])
+    return S @ P
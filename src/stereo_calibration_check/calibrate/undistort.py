@@ -4,21 +4,97 @@ Module to undistort and rectify fisheye images using camera calibration data.
 import cv2
 import numpy as np
 
+from ..utils.profiling import timed
+from .map_cache import (CachedRemapper, MapCache, Maps, calibration_digest,
+                        shared_remapper)
 
-def rectify_image(image: np.ndarray, output_path: [str | None], intrinsics: dict,
-                  R_new: np.ndarray,
-                  P_new: np.ndarray) -> np.ndarray:
+
+@timed('rectify_maps')
+def build_rectify_maps(intrinsics: dict, R_new: np.ndarray, P_new: np.ndarray,
+                       size: tuple[int, int],
+                       rows: tuple[int, int] | None = None,
+                       tile_rows: int = 64) -> Maps:
     """
-    Rectify a fisheye image using calibration data.
+    Build the fixed-point (CV_16SC2, CV_16UC1) rectification maps for a
+    fisheye camera and an output image of the given (width, height).
+
+    With rows = (y0, y1) only the maps of output rows y0..y1-1 are built.
     """
-    h, w = image.shape[:2]
     K = intrinsics['K']
     D = intrinsics['D']
+    if rows is None:
+        return cv2.fisheye.initUndistortRectifyMap(K, D, R_new, P_new, size,
+                                                   cv2.CV_16SC2)
+
+    # Same model as initUndistortRectifyMap for a band of rows: an output
+    # pixel is un-projected with K_rect from P_new = [K_rect | Tx], rotated
+    # back into the original camera frame (X_rect = R_new * X_orig) and
+    # projected with the fisheye model. Rows are processed in tiles of
+    # tile_rows so temporaries stay small.
+    w = size[0]
+    y_start, y_end = rows
+    M = np.linalg.inv(np.asarray(P_new, dtype=np.float64)[:3, :3] @
+                      np.asarray(R_new, dtype=np.float64))
+    map1 = np.empty((y_end - y_start, w, 2), dtype=np.int16)
+    map2 = np.empty((y_end - y_start, w), dtype=np.uint16)
+    pixels = np.ones((tile_rows, w, 3))
+    pixels[:, :, 0] = np.arange(w)
+    for y0 in range(y_start, y_end, tile_rows):
+        n = min(tile_rows, y_end - y0)
+        tile = pixels[:n]
+        tile[:, :, 1] = np.arange(y0, y0 + n)[:, np.newaxis]
+        rays = tile @ M.T
+        behind = rays[..., 2] <= 0
+        rays[behind, 2] = 1
+        normalized = rays[..., :2] / rays[..., 2:]
+        distorted = cv2.fisheye.distortPoints(normalized.reshape(-1, 1, 2),
+                                              K, D)
+        distorted = np.float32(distorted).reshape(n, w, 2)
+        # Rays behind the camera have no source pixel.
+        distorted[behind] = -1e6
+        i = y0 - y_start
+        map1[i:i + n], map2[i:i + n] = cv2.convertMaps(distorted, None,
+                                                       cv2.CV_16SC2)
+    return map1, map2
+
+
+class Rectifier(CachedRemapper):
+    """
+    Reusable fisheye rectifier. Calling it on a frame only runs cv2.remap,
+    the maps are built on first use and shared through the map cache.
+    """
+    kind = 'rectify'
+
+    def __init__(self, intrinsics: dict, R_new: np.ndarray, P_new: np.ndarray,
+                 cache: MapCache | None = None,
+                 interpolation: int = cv2.INTER_LINEAR,
+                 output_size: tuple[int, int] | None = None,
+                 strip_rows: int | None = None):
+        super().__init__(cache, interpolation, output_size, strip_rows)
+        self.intrinsics = intrinsics
+        self.R_new = np.asarray(R_new)
+        self.P_new = np.asarray(P_new)
+        self._digest = calibration_digest(intrinsics, self.R_new,
+                                          self.P_new)
+
+    def build_maps(self, size: tuple[int, int],
+                   rows: tuple[int, int] | None = None) -> Maps:
+        return build_rectify_maps(self.intrinsics, self.R_new, self.P_new,
+                                  size, rows)
+
 
-    map1, map2 = cv2.fisheye.initUndistortRectifyMap(K, D, R_new, P_new, (w, h),
-                                                     cv2.CV_16SC2)
-    rectified_image = cv2.remap(image, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, 
-        borderValue=(0, 0, 0))
+def rectify_image(image: np.ndarray, output_path: [str | None], intrinsics: dict,
+                  R_new: np.ndarray,
+                  P_new: np.ndarray,
+                  strip_rows: int | None = None,
+                  out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Rectify a fisheye image using calibration data, in strips of strip_rows
+    rows when given, into out when given.
+    """
+    rectifier = shared_remapper(Rectifier(intrinsics, R_new, P_new,
+                                          strip_rows=strip_rows))
+    rectified_image = rectifier(image, out)
 
     if output_path is not None:
         cv2.imwrite(output_path, rectified_image)
@@ -0,0 +1,148 @@
+"""
+Dense vertical disparity of a rectified pair from block correlation.
+
+Instead of sparse keypoints, a grid of patches of the left image is searched
+for in a narrow band of rows of the right image with normalized
+cross-correlation. This needs no texture beyond the patches themselves, which
+suits low-contrast thermal images better than SIFT.
+"""
+from dataclasses import dataclass, field, fields
+import math
+
+import cv2 as cv
+import numpy as np
+
+from ..utils.profiling import timed
+
+
+@dataclass(frozen=True)
+class DisparityMap:
+    """
+    Vertical offset y_right - y_left in pixels of each grid region, NaN
+    where the region had too little texture or no confident match, and the
+    statistics of its absolute value over the valid regions.
+    """
+    num_regions: int
+    num_valid: int
+    mean_dy: float
+    median_dy: float
+    p95_dy: float
+    max_dy: float
+    dy: np.ndarray = field(repr=False, compare=False)
+    score: np.ndarray = field(repr=False, compare=False)
+    centers: np.ndarray = field(repr=False, compare=False)
+
+    @property
+    def valid_ratio(self) -> float:
+        return self.num_valid / self.num_regions if self.num_regions else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        Return the statistics and the dy map as a JSON-friendly dict, NaN
+        becomes None.
+        """
+        record = {}
+        for f in fields(self):
+            if f.name in ('score', 'centers'):
+                continue
+            value = getattr(self, f.name)
+            if isinstance(value, np.ndarray):
+                value = [[None if math.isnan(v) else round(float(v), 3)
+                          for v in row] for row in value]
+            elif isinstance(value, float) and math.isnan(value):
+                value = None
+            record[f.name] = value
+        return record
+
+
+def _subpixel_peak(scores: np.ndarray, i: int) -> float:
+    """
+    Offset in [-0.5, 0.5] of the parabola vertex through scores[i - 1:i + 2].
+    """
+    if i == 0 or i == len(scores) - 1:
+        return 0.0
+    left, center, right = scores[i - 1], scores[i], scores[i + 1]
+    denominator = left - 2 * center + right
+    if denominator >= 0:
+        return 0.0
+    return float(np.clip(0.5 * (left - right) / denominator, -0.5, 0.5))
+
+
+def grid_centers(width: int, height: int, grid: tuple[int, int],
+                 margin: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the x and y centers of a cols x rows grid of regions evenly
+    covering the image inside margin.
+    """
+    cols, rows = grid
+    xs = np.linspace(margin, width - margin, 2 * cols + 1)[1::2]
+    ys = np.linspace(margin, height - margin, 2 * rows + 1)[1::2]
+    return np.rint(xs).astype(int), np.rint(ys).astype(int)
+
+
+@timed('block_disparity')
+def compute_block_disparity(img1: np.ndarray, img2: np.ndarray,
+                            grid: tuple[int, int] = (8, 6),
+                            patch_size: int = 32,
+                            search_dy: int = 8,
+                            max_disparity: int = 64,
+                            margin: int = 100,
+                            min_std: float = 4.0,
+                            min_score: float = 0.6) -> DisparityMap:
+    """
+    Measure the vertical misalignment of a rectified pair on a grid.
+
+    For each of the cols x rows regions, the patch_size square patch of img1
+    at its center is located in img2 with cv.TM_CCOEFF_NORMED, over
+    horizontal disparities 0..max_disparity (objects appear further left in
+    the right image) and vertical offsets -search_dy..search_dy, and the
+    vertical offset of the best match is refined to sub-pixel precision.
+    Patches with an intensity standard deviation below min_std, a best
+    score below min_score or the best offset on the edge of the search band
+    are left NaN.
+    """
+    if img1.ndim == 3:
+        img1 = cv.cvtColor(img1, cv.COLOR_BGR2GRAY)
+    if img2.ndim == 3:
+        img2 = cv.cvtColor(img2, cv.COLOR_BGR2GRAY)
+    h, w = img1.shape[:2]
+    half = patch_size // 2
+    xs, ys = grid_centers(w, h, grid, margin)
+
+    dy = np.full((len(ys), len(xs)), np.nan)
+    score = np.zeros((len(ys), len(xs)))
+    for r, cy in enumerate(ys):
+        y0 = cy - half
+        # Rows of img2 the patch can match, clipped to the image.
+        sy0 = max(y0 - search_dy, 0)
+        sy1 = min(y0 + patch_size + search_dy, h)
+        if y0 < 0 or y0 + patch_size > h or sy1 - sy0 < patch_size:
+            continue
+        band = img2[sy0:sy1]
+        for c, cx in enumerate(xs):
+            x0 = cx - half
+            if x0 < 0 or x0 + patch_size > w:
+                continue
+            patch = img1[y0:y0 + patch_size, x0:x0 + patch_size]
+            if patch.std() < min_std:
+                continue
+            sx0 = max(x0 - max_disparity, 0)
+            sx1 = x0 + patch_size
+            result = cv.matchTemplate(band[:, sx0:sx1], patch,
+                                      cv.TM_CCOEFF_NORMED)
+            i, j = np.unravel_index(int(result.argmax()), result.shape)
+            score[r, c] = result[i, j]
+            # A peak on the edge of the search band may lie outside of it.
+            if result[i, j] < min_score or i in (0, len(result) - 1):
+                continue
+            dy[r, c] = sy0 + i + _subpixel_peak(result[:, j], i) - y0
+
+    valid = np.abs(dy[~np.isnan(dy)])
+    if len(valid):
+        stats = (float(valid.mean()), float(np.median(valid)),
+                 float(np.percentile(valid, 95)), float(valid.max()))
+    else:
+        stats = (float('nan'),) * 4
+    centers = np.stack(np.meshgrid(xs, ys), axis=-1)
+    return DisparityMap(dy.size, len(valid), *stats, dy=dy, score=score,
+                        centers=centers)
@@ -0,0 +1,106 @@
+"""
+Coarse-to-fine epipolar check that only goes to full resolution when the
+downscaled estimate is too close to the decision threshold.
+"""
+import math
+
+import cv2 as cv
+import numpy as np
+
+from ..calibrate.stereo_calibrate import scale_projection
+from ..calibrate.undistort import Rectifier
+from ..feature_detection.matchers import FeatureMatcher
+from .epipolar_error import EpipolarError, compute_epipolar_error
+
+
+def downscale(image: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Downscale an image, using the Gaussian pyramid for powers of two.
+    """
+    levels = -math.log2(scale)
+    if levels.is_integer():
+        for _ in range(int(levels)):
+            image = cv.pyrDown(image)
+        return image
+    return cv.resize(image, None, fx=scale, fy=scale,
+                     interpolation=cv.INTER_AREA)
+
+
+class CoarseToFineCheck:
+    """
+    Epipolar check run first on a downscaled pair.
+
+    The coarse result is returned unless its median vertical error lies
+    within escalate_margin pixels (full resolution) of threshold or it has
+    fewer than min_inliers inliers, in which case the pair is checked again
+    at full resolution.
+
+    Without rectifiers the input frames must already be rectified and are
+    downscaled with the image pyramid. With (left, right) rectifiers the
+    input frames are raw and are rectified straight to the coarse
+    resolution using the scaled projection matrices, and only rectified at
+    full resolution when escalating.
+    """
+
+    def __init__(self, threshold: float = 1.0, scale: float = 0.5,
+                 margin: int = 100, matcher: FeatureMatcher | None = None,
+                 rectifiers: tuple[Rectifier, Rectifier] | None = None,
+                 escalate_margin: float | None = None,
+                 min_inliers: int = 20, method: str = 'lmeds',
+                 max_matches: int | None = None):
+        self.threshold = threshold
+        self.scale = scale
+        self.margin = margin
+        self.matcher = matcher
+        self.rectifiers = rectifiers
+        # Sub-pixel keypoints are good to roughly a quarter of a coarse
+        # pixel, closer than that to the threshold the coarse level cannot
+        # decide.
+        self.escalate_margin = (0.25 / scale if escalate_margin is None else
+                                escalate_margin)
+        self.min_inliers = min_inliers
+        self.method = method
+        self.max_matches = max_matches
+        self.coarse_rectifiers = None
+        if rectifiers is not None:
+            self.coarse_rectifiers = tuple(
+                self._coarse_rectifier(rectifier) for rectifier in rectifiers)
+
+    def _coarse_rectifier(self, rectifier: Rectifier) -> Rectifier:
+        w = rectifier.intrinsics['width']
+        h = rectifier.intrinsics['height']
+        return Rectifier(rectifier.intrinsics, rectifier.R_new,
+                         scale_projection(rectifier.P_new, self.scale),
+                         cache=rectifier.cache,
+                         interpolation=rectifier.interpolation,
+                         output_size=(round(w * self.scale),
+                                      round(h * self.scale)),
+                         strip_rows=rectifier.strip_rows)
+
+    def needs_full_resolution(self, coarse: EpipolarError) -> bool:
+        if coarse.num_inliers < self.min_inliers or math.isnan(
+                coarse.median_dy):
+            return True
+        return abs(coarse.median_dy - self.threshold) <= self.escalate_margin
+
+    def __call__(self, img1: np.ndarray, img2: np.ndarray) -> EpipolarError:
+        if self.coarse_rectifiers is not None:
+            coarse1 = self.coarse_rectifiers[0](img1)
+            coarse2 = self.coarse_rectifiers[1](img2)
+        else:
+            coarse1 = downscale(img1, self.scale)
+            coarse2 = downscale(img2, self.scale)
+        coarse = compute_epipolar_error(
+            coarse1, coarse2, margin=round(self.margin * self.scale),
+            matcher=self.matcher, method=self.method,
+            max_matches=self.max_matches,
+            scale=self.scale).to_full_resolution(self.scale)
+        if not self.needs_full_resolution(coarse):
+            return coarse
+
+        if self.rectifiers is not None:
+            img1 = self.rectifiers[0](img1)
+            img2 = self.rectifiers[1](img2)
+        return compute_epipolar_error(img1, img2, margin=self.margin,
+                                      matcher=self.matcher, method=self.method,
+                                      max_matches=self.max_matches)
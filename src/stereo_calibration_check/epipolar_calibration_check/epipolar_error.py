@@ -0,0 +1,133 @@
+"""
+Numeric epipolar error of a rectified image pair.
+"""
+from dataclasses import dataclass, field, fields, replace
+import math
+
+import numpy as np
+
+from ..feature_detection.matchers import FeatureMatcher
+from ..feature_detection.sift import sift_feature_detection
+from .epipolar_line import filter_margin, fit_fundamental, render_epilines
+
+
+@dataclass(frozen=True)
+class EpipolarError:
+    """
+    Vertical disparity statistics of all matches away from the image
+    margins and Sampson error statistics of the inlier matches of the
+    fundamental matrix, in pixels. The vertical disparity does not depend on
+    the inlier mask, so a misalignment is not hidden by an estimator that
+    rejects the matches showing it. Statistics are NaN when no fundamental
+    matrix could be fit.
+    scale is the resolution of the images they were measured on relative to
+    the full-resolution frames. inliers holds the inlier matches, in pixels
+    of those images, when they were asked for.
+    """
+    num_matches: int
+    num_inliers: int
+    mean_dy: float
+    median_dy: float
+    p95_dy: float
+    mean_sampson: float
+    p95_sampson: float
+    scale: float = 1.0
+    epilines: tuple[np.ndarray, np.ndarray] | None = field(default=None,
+                                                           repr=False,
+                                                           compare=False)
+    inliers: tuple[np.ndarray, np.ndarray] | None = field(default=None,
+                                                          repr=False,
+                                                          compare=False)
+
+    def to_full_resolution(self, scale: float) -> 'EpipolarError':
+        """
+        Convert statistics measured on images downscaled by scale to
+        full-resolution pixels.
+        """
+        return replace(self,
+                       mean_dy=self.mean_dy / scale,
+                       median_dy=self.median_dy / scale,
+                       p95_dy=self.p95_dy / scale,
+                       mean_sampson=self.mean_sampson / scale,
+                       p95_sampson=self.p95_sampson / scale,
+                       scale=scale)
+
+    def as_dict(self) -> dict:
+        """
+        Return the statistics as a JSON-friendly dict, NaN becomes None.
+        """
+        record = {}
+        for f in fields(self):
+            if f.name in ('epilines', 'inliers'):
+                continue
+            value = getattr(self, f.name)
+            record[f.name] = None if isinstance(value, float) and math.isnan(value) else value
+        return record
+
+
+def sampson_distance(F: np.ndarray, pts1: np.ndarray,
+                     pts2: np.ndarray) -> np.ndarray:
+    """
+    First-order geometric distance in pixels of each match to the epipolar
+    geometry x2^T F x1 = 0.
+    """
+    x1 = np.column_stack([pts1, np.ones(len(pts1))])
+    x2 = np.column_stack([pts2, np.ones(len(pts2))])
+    Fx1 = x1 @ F.T
+    Ftx2 = x2 @ F
+    numerator = np.einsum('ij,ij->i', x2, Fx1)**2
+    denominator = Fx1[:, 0]**2 + Fx1[:, 1]**2 + Ftx2[:, 0]**2 + Ftx2[:, 1]**2
+    return np.sqrt(numerator / np.maximum(denominator, np.finfo(float).tiny))
+
+
+def compute_epipolar_error(img1: np.ndarray, img2: np.ndarray,
+                           margin: int = 100,
+                           draw: bool = False,
+                           matcher: FeatureMatcher | None = None,
+                           method: str = 'lmeds',
+                           max_matches: int | None = None,
+                           scale: float = 1.0,
+                           keep_inliers: bool = False
+                           ) -> EpipolarError:
+    """
+    Match features (SIFT unless another matcher is given) between a
+    rectified pair and measure how far the matches are from horizontal
+    epipolar lines.
+
+    method and max_matches select the fundamental matrix estimator and cap
+    the number of matches it is fit on, and scale is the resolution of the
+    pair relative to the full-resolution frames, see fit_fundamental.
+
+    With draw=True the epiline overlays are rendered as well and returned in
+    the epilines field of the record, with keep_inliers=True the inlier
+    matches in its inliers field.
+    """
+    pts1, pts2 = sift_feature_detection(img1, img2, matcher)
+    num_matches = len(pts1)
+    pts1, pts2 = filter_margin(pts1, pts2, img1.shape[1], img1.shape[0],
+                               margin)
+    F = None
+    if len(pts1) >= 8:
+        F, inliers1, inliers2 = fit_fundamental(pts1, pts2, method,
+                                                max_matches, scale)
+    if F is None or len(inliers1) == 0:
+        nan = float('nan')
+        return EpipolarError(num_matches, 0, nan, nan, nan, nan, nan)
+
+    dy = np.abs(np.float64(pts1[:, 1]) - np.float64(pts2[:, 1]))
+    inliers1 = np.float64(inliers1)
+    inliers2 = np.float64(inliers2)
+    sampson = sampson_distance(F, inliers1, inliers2)
+    epilines = (render_epilines(img1, img2, F, inliers1, inliers2) if draw
+                else None)
+
+    return EpipolarError(num_matches=num_matches,
+                         num_inliers=len(inliers1),
+                         mean_dy=float(dy.mean()),
+                         median_dy=float(np.median(dy)),
+                         p95_dy=float(np.percentile(dy, 95)),
+                         mean_sampson=float(sampson.mean()),
+                         p95_sampson=float(np.percentile(sampson, 95)),
+                         epilines=epilines,
+                         inliers=((inliers1, inliers2) if keep_inliers
+                                  else None))
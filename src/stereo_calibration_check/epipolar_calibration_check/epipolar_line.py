@@ -5,65 +5,174 @@ import cv2 as cv
 import numpy as np
 from ..feature_detection.corners import corner_detection
 from ..feature_detection.sift import sift_feature_detection
+from ..utils.profiling import timed
+from .fundamental import estimate_fundamental, subsample_matches
 
 
-def drawlines(img1, img2, lines, pts1, pts2):
-    ''' img1 - image on which we draw the epilines for the points in img2
-        lines - corresponding epilines '''
-    r, c = img1.shape
-    img1 = cv.cvtColor(img1, cv.COLOR_GRAY2BGR)
-    img2 = cv.cvtColor(img2, cv.COLOR_GRAY2BGR)
-    for r, pt1, pt2 in zip(lines, pts1, pts2):
-        color = tuple(np.random.randint(0, 255, 3).tolist())
-        x0, y0 = map(int, [0, -r[2] / r[1]])
-        x1, y1 = map(int, [c, -(r[2] + r[0] * c) / r[1]])
-        img1 = cv.line(img1, (x0, y0), (x1, y1), color, 1)
-        img1 = cv.circle(img1, tuple(pt1), 5, color, -1)
-        img2 = cv.circle(img2, tuple(pt2), 5, color, -1)
-    return img1, img2
+def _make_palette(size: int) -> np.ndarray:
+    hsv = np.full((1, size, 3), 255, dtype=np.uint8)
+    hsv[0, :, 0] = np.arange(size) * 180 // size
+    return cv.cvtColor(hsv, cv.COLOR_HSV2BGR)[0]
 
 
-def draw_epilines_corners(img1: np.ndarray,
-                          img2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
-    pts1, pts2 = corner_detection(img1, img2)
-    # Compute Fundamental Matrix
-    F, mask = cv.findFundamentalMat(pts1, pts2, cv.FM_LMEDS)
-    pts1 = pts1[mask.ravel() == 1]
-    pts2 = pts2[mask.ravel() == 1]
+# Fixed colors so repeated runs render identical overlays.
+EPILINE_PALETTE = _make_palette(32)
+POINT_RADIUS = 5
 
-    lines1 = cv.computeCorrespondEpilines(pts2.reshape(-1, 1, 2), 2, F)
-    lines1 = lines1.reshape(-1, 3)
-    img5, img6 = drawlines(img1, img2, lines1, pts1, pts2)
 
-    lines2 = cv.computeCorrespondEpilines(pts1.reshape(-1, 1, 2), 1, F)
-    lines2 = lines2.reshape(-1, 3)
-    img3, img4 = drawlines(img2, img1, lines2, pts2, pts1)
-    return img5, img3
+def _subsample(count: int, max_lines: int | None) -> np.ndarray:
+    if max_lines is None or count <= max_lines:
+        return np.arange(count)
+    return np.linspace(0, count - 1, max_lines).astype(int)
 
 
-def draw_epilines_sift(img1: np.ndarray,
-                       img2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
-    pts1, pts2 = sift_feature_detection(img1, img2)
-    margin = 100
-    width = img1.shape[1]
-    height = img1.shape[0]
+def _to_bgr(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 2:
+        return cv.cvtColor(img, cv.COLOR_GRAY2BGR)
+    return img.copy()
+
+
+def _draw_points(img: np.ndarray, pts: np.ndarray, colors: np.ndarray,
+                 radius: int = POINT_RADIUS) -> None:
+    """
+    Stamp filled discs at all points at once with fancy indexing.
+    """
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    disc = dx**2 + dy**2 <= radius**2
+    offsets = np.stack([dx[disc], dy[disc]], axis=-1)
+
+    coords = np.rint(pts).astype(np.int64)[:, np.newaxis, :] + offsets
+    h, w = img.shape[:2]
+    inside = (coords[..., 0] >= 0) & (coords[..., 0] < w) & \
+             (coords[..., 1] >= 0) & (coords[..., 1] < h)
+    point_idx = np.broadcast_to(np.arange(len(pts))[:, np.newaxis],
+                                inside.shape)[inside]
+    coords = coords[inside]
+    img[coords[:, 1], coords[:, 0]] = colors[point_idx]
+
+
+def draw_epilines_on(img: np.ndarray, lines: np.ndarray, pts: np.ndarray,
+                     max_lines: int | None = None) -> np.ndarray:
+    """
+    Draw epilines and their points on a BGR copy of img.
+
+    lines - epilines (a, b, c) in img
+    pts - points in img, drawn in the color of the matching line
+    max_lines - evenly subsample to at most this many lines
+    """
+    idx = _subsample(len(lines), max_lines)
+    lines = np.asarray(lines, dtype=np.float64).reshape(-1, 3)[idx]
+    pts = np.asarray(pts).reshape(-1, 2)[idx]
+    out = _to_bgr(img)
+    c = out.shape[1]
+
+    # End points of every line at x = 0 and x = c, in one pass.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y0 = -lines[:, 2] / lines[:, 1]
+        y1 = -(lines[:, 2] + lines[:, 0] * c) / lines[:, 1]
+    valid = np.isfinite(y0) & np.isfinite(y1)
+    ends = np.zeros((len(lines), 2, 2), dtype=np.int32)
+    ends[:, 1, 0] = c
+    ends[valid, 0, 1] = np.clip(y0[valid], -1e6, 1e6)
+    ends[valid, 1, 1] = np.clip(y1[valid], -1e6, 1e6)
+
+    # One polylines call per palette color instead of one line call per match.
+    color_idx = np.arange(len(lines)) % len(EPILINE_PALETTE)
+    for k, color in enumerate(EPILINE_PALETTE):
+        selected = valid & (color_idx == k)
+        if selected.any():
+            cv.polylines(out, ends[selected], False, color.tolist(), 1)
+
+    _draw_points(out, pts, EPILINE_PALETTE[color_idx])
+    return out
 
+
+def drawlines(img1, img2, lines, pts1, pts2, max_lines=None):
+    ''' img1 - image on which we draw the epilines for the points in img2
+        lines - corresponding epilines '''
+    idx = _subsample(len(lines), max_lines)
+    img1 = draw_epilines_on(img1, lines[idx], pts1[idx])
+    img2 = _to_bgr(img2)
+    color_idx = np.arange(len(idx)) % len(EPILINE_PALETTE)
+    _draw_points(img2, np.asarray(pts2).reshape(-1, 2)[idx],
+                 EPILINE_PALETTE[color_idx])
+    return img1, img2
+
+
+def filter_margin(pts1: np.ndarray, pts2: np.ndarray, width: int, height: int,
+                  margin: int = 100) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Keep only matches whose points lie at least margin pixels inside both
+    images, where fisheye rectification is least reliable.
+    """
     mask_inliers = (pts1[:, 0] > margin) & (pts1[:, 0] < width - margin) & \
                    (pts1[:, 1] > margin) & (pts1[:, 1] < height - margin) & \
                    (pts2[:, 0] > margin) & (pts2[:, 0] < width - margin) & \
                    (pts2[:, 1] > margin) & (pts2[:, 1] < height - margin)
-    pts1 = pts1[mask_inliers]
-    pts2 = pts2[mask_inliers]
-    # Compute Fundamental Matrix
-    F, mask = cv.findFundamentalMat(pts1, pts2, cv.FM_LMEDS)
-    pts1 = pts1[mask.ravel() == 1]
-    pts2 = pts2[mask.ravel() == 1]
+    return pts1[mask_inliers], pts2[mask_inliers]
+
+
+@timed('fundamental')
+def fit_fundamental(
+    pts1: np.ndarray, pts2: np.ndarray, method: str = 'lmeds',
+    max_matches: int | None = None, scale: float = 1.0
+) -> tuple[np.ndarray | None, np.ndarray, np.ndarray]:
+    """
+    Fit the fundamental matrix and return it with the inlier matches.
+    F is None when there are too few matches for a fit.
+
+    method - estimator, see estimate_fundamental
+    max_matches - fit on a random subset of at most this many matches
+    scale - resolution of the points relative to the full-resolution
+            frames, the pixel thresholds of the estimator are scaled by it
+    """
+    pts1, pts2 = subsample_matches(pts1, pts2, max_matches)
+    F, mask = estimate_fundamental(pts1, pts2, method,
+                                   expected_threshold=1.0 * scale,
+                                   inlier_threshold=3.0 * scale,
+                                   ransac_threshold=1.0 * scale)
+    if F is None:
+        return None, pts1[:0], pts2[:0]
+    return F, pts1[mask], pts2[mask]
+
+
+@timed('render')
+def render_epilines(img1: np.ndarray, img2: np.ndarray, F: np.ndarray,
+                    pts1: np.ndarray, pts2: np.ndarray,
+                    max_lines: int | None = None
+                    ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Draw on each image the epilines of the matched points of the other one.
+    """
+    idx = _subsample(len(pts1), max_lines)
+    pts1 = np.float32(pts1[idx])
+    pts2 = np.float32(pts2[idx])
 
     lines1 = cv.computeCorrespondEpilines(pts2.reshape(-1, 1, 2), 2, F)
-    lines1 = lines1.reshape(-1, 3)
-    img5, img6 = drawlines(img1, img2, lines1, pts1, pts2)
+    img5 = draw_epilines_on(img1, lines1.reshape(-1, 3), pts1)
 
     lines2 = cv.computeCorrespondEpilines(pts1.reshape(-1, 1, 2), 1, F)
-    lines2 = lines2.reshape(-1, 3)
-    img3, img4 = drawlines(img2, img1, lines2, pts2, pts1)
+    img3 = draw_epilines_on(img2, lines2.reshape(-1, 3), pts2)
     return img5, img3
+
+
+def draw_epilines_corners(
+        img1: np.ndarray,
+        img2: np.ndarray,
+        max_lines: int | None = None,
+        method: str = 'lmeds') -> tuple[np.ndarray, np.ndarray]:
+    pts1, pts2 = corner_detection(img1, img2)
+    F, pts1, pts2 = fit_fundamental(pts1, pts2, method)
+    return render_epilines(img1, img2, F, pts1, pts2, max_lines)
+
+
+def draw_epilines_sift(
+        img1: np.ndarray,
+        img2: np.ndarray,
+        max_lines: int | None = None,
+        method: str = 'lmeds',
+        max_matches: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    pts1, pts2 = sift_feature_detection(img1, img2)
+    pts1, pts2 = filter_margin(pts1, pts2, img1.shape[1], img1.shape[0])
+    F, pts1, pts2 = fit_fundamental(pts1, pts2, method, max_matches)
+    return render_epilines(img1, img2, F, pts1, pts2, max_lines)
@@ -0,0 +1,74 @@
+"""
+Fundamental matrix estimation for rectified pairs.
+"""
+import cv2 as cv
+import numpy as np
+
+# Fundamental matrix of an ideally rectified pair: epipolar lines are image
+# rows, so x2^T F x1 = y1 - y2.
+RECTIFIED_F = np.array([[0., 0., 0.], [0., 0., -1.], [0., 1., 0.]])
+
+METHODS = ('lmeds', 'ransac', 'magsac', 'auto')
+
+
+def subsample_matches(pts1: np.ndarray, pts2: np.ndarray,
+                      max_matches: int | None,
+                      seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Keep a random subset of at most max_matches matches, in their order.
+    """
+    if max_matches is None or len(pts1) <= max_matches:
+        return pts1, pts2
+    idx = np.sort(np.random.default_rng(seed).choice(len(pts1), max_matches,
+                                                     replace=False))
+    return pts1[idx], pts2[idx]
+
+
+def score_rectified(pts1: np.ndarray, pts2: np.ndarray) -> np.ndarray:
+    """
+    Return the vertical disparity |y1 - y2| of each match, its distance in
+    pixels to the epipolar lines of RECTIFIED_F.
+    """
+    return np.abs(np.float32(pts1[:, 1]) - np.float32(pts2[:, 1]))
+
+
+def estimate_fundamental(
+    pts1: np.ndarray, pts2: np.ndarray, method: str = 'lmeds',
+    expected_threshold: float = 1.0, inlier_threshold: float = 3.0,
+    ransac_threshold: float = 1.0, confidence: float = 0.999,
+    max_iters: int = 2000
+) -> tuple[np.ndarray | None, np.ndarray]:
+    """
+    Estimate the fundamental matrix and return it with the inlier mask.
+
+    method is one of
+        'lmeds'  - cv.FM_LMEDS on all matches
+        'ransac' - cv.FM_RANSAC
+        'magsac' - cv.USAC_MAGSAC, stopping after max_iters or once
+                   confidence is reached
+        'auto'   - score the matches against RECTIFIED_F first and accept it
+                   when their median vertical disparity is within
+                   expected_threshold pixels, with matches within
+                   inlier_threshold as inliers, falling back to 'magsac'
+                   otherwise
+    F is None when no fit was possible.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+    if method == 'auto':
+        dy = score_rectified(pts1, pts2)
+        if len(dy) >= 8 and np.median(dy) <= expected_threshold:
+            return RECTIFIED_F.copy(), dy <= inlier_threshold
+        method = 'magsac'
+
+    if len(pts1) < 8:
+        return None, np.zeros(len(pts1), dtype=bool)
+    if method == 'lmeds':
+        F, mask = cv.findFundamentalMat(pts1, pts2, cv.FM_LMEDS)
+    else:
+        flag = cv.FM_RANSAC if method == 'ransac' else cv.USAC_MAGSAC
+        F, mask = cv.findFundamentalMat(pts1, pts2, flag, ransac_threshold,
+                                        confidence, max_iters)
+    if F is None or mask is None or F.shape != (3, 3):
+        return None, np.zeros(len(pts1), dtype=bool)
+    return F, mask.ravel() == 1
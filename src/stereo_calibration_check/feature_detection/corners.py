@@ -1,40 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
 import cv2 as cv
 import numpy as np
 
+PATTERN_SIZE = (8, 6)
+SUBPIX_CRITERIA = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30,
+                   0.001)
+# The fast check rejects images without a board early but slows down the
+# search when there is one, so it is left out where a board is expected.
+ROI_FLAGS = cv.CALIB_CB_ADAPTIVE_THRESH | cv.CALIB_CB_NORMALIZE_IMAGE
+FIND_FLAGS = ROI_FLAGS | cv.CALIB_CB_FAST_CHECK
 
-def corner_detection(img1: np.ndarray,
-                     img2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
-    pattern_size = (8, 6)
 
-    # 3. Find Chessboard Corners (Replaces SIFT)
-    ret1, corners1 = cv.findChessboardCorners(img1, pattern_size, None)
-    ret2, corners2 = cv.findChessboardCorners(img2, pattern_size, None)
+@dataclass(frozen=True)
+class CornerResult:
+    """
+    Sub-pixel chessboard corners of a stereo pair as float32 (N, 2) arrays.
+    When the board is not found in both images, found is False, the arrays
+    are empty and message says why.
+    """
+    found: bool
+    pts1: np.ndarray
+    pts2: np.ndarray
+    message: str = ''
+
+
+class ChessboardDetector:
+    """
+    Chessboard detector for consecutive stereo frames.
+
+    Left and right images are searched concurrently. Each search first looks
+    inside the board region found in the previous frame of that camera, at
+    full resolution, then on a copy of the whole image downscaled by
+    prescale with CALIB_CB_FAST_CHECK, so frames without a board are
+    rejected cheaply. The corners are refined with cornerSubPix on the full
+    image.
+    """
+
+    def __init__(self, pattern_size: tuple[int, int] = PATTERN_SIZE,
+                 prescale: float | None = 0.5, roi_margin: int = 40,
+                 concurrent: bool = True):
+        self.pattern_size = pattern_size
+        self.prescale = prescale
+        self.roi_margin = roi_margin
+        self._rois = [None, None]
+        self._executor = ThreadPoolExecutor(2) if concurrent else None
+
+    def __enter__(self) -> 'ChessboardDetector':
+        return self
 
-    if ret1 and ret2:
-        # 4. Refine corners to sub-pixel accuracy (Critical for calibration/epipolar geometry)
-        criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30,
-                    0.001)
-        corners1 = cv.cornerSubPix(img1, corners1, (11, 11), (-1, -1),
-                                   criteria)
-        corners2 = cv.cornerSubPix(img2, corners2, (11, 11), (-1, -1),
-                                   criteria)
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
-        # 5. Prepare points
-        # Squeeze the shape from (N, 1, 2) to (N, 2) to match the original script's format
-        pts1 = corners1.squeeze()
-        pts2 = corners2.squeeze()
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
 
-        # Convert to int32 as per the original script's requirement for drawing
-        # (Though findFundamentalMat works better with floats, we stick to your original flow)
-        pts1 = np.int32(pts1)
-        pts2 = np.int32(pts2)
+    def reset(self) -> None:
+        """
+        Forget the board regions of previous frames.
+        """
+        self._rois = [None, None]
 
-    else:
-        print(
-            "Error: Chessboard corners not found in one or both images. Check pattern_size."
-        )
-        exit()
+    def _find_in_roi(self, img: np.ndarray, side: int) -> np.ndarray | None:
+        roi = self._rois[side]
+        if roi is None:
+            return None
+        x0, y0, x1, y1 = roi
+        # The region is already small, search it at full resolution: corners
+        # found in a downscaled crop can be off by several pixels, more than
+        # cornerSubPix can pull back.
+        ret, corners = cv.findChessboardCorners(img[y0:y1, x0:x1],
+                                                self.pattern_size, None,
+                                                ROI_FLAGS)
+        if not ret:
+            return None
+        return corners + np.float32([x0, y0])
 
-    return pts1, pts2
+    def _find_downscaled(self, img: np.ndarray,
+                         flags: int = FIND_FLAGS) -> np.ndarray | None:
+        if self.prescale is None:
+            ret, corners = cv.findChessboardCorners(img, self.pattern_size,
+                                                    None, flags)
+            return corners if ret else None
 
+        small = cv.resize(img, None, fx=self.prescale, fy=self.prescale,
+                          interpolation=cv.INTER_AREA)
+        ret, corners = cv.findChessboardCorners(small, self.pattern_size,
+                                                None, flags)
+        if not ret:
+            return None
+        # Back to full-resolution pixel coordinates.
+        return (corners + 0.5) / self.prescale - 0.5
 
+    def find(self, img: np.ndarray, side: int = 0) -> np.ndarray | None:
+        """
+        Return float32 (N, 2) sub-pixel corners of one image, or None.
+        side (0 left, 1 right) selects which previous board region is reused.
+        """
+        corners = self._find_in_roi(img, side)
+        if corners is None:
+            corners = self._find_downscaled(img)
+        if corners is None:
+            self._rois[side] = None
+            return None
+
+        # Refine corners to sub-pixel accuracy (Critical for calibration/epipolar geometry)
+        corners = cv.cornerSubPix(img, np.float32(corners), (11, 11),
+                                  (-1, -1), SUBPIX_CRITERIA)
+        pts = corners.reshape(-1, 2)
+
+        h, w = img.shape[:2]
+        x0, y0 = np.floor(pts.min(axis=0)).astype(int) - self.roi_margin
+        x1, y1 = np.ceil(pts.max(axis=0)).astype(int) + self.roi_margin
+        self._rois[side] = (max(x0, 0), max(y0, 0), min(x1, w), min(y1, h))
+        return pts
+
+    def detect(self, img1: np.ndarray, img2: np.ndarray) -> CornerResult:
+        """
+        Find the chessboard in both images of a stereo pair.
+        """
+        if self._executor is not None:
+            future1 = self._executor.submit(self.find, img1, 0)
+            future2 = self._executor.submit(self.find, img2, 1)
+            pts1, pts2 = future1.result(), future2.result()
+        else:
+            pts1, pts2 = self.find(img1, 0), self.find(img2, 1)
+
+        if pts1 is None or pts2 is None:
+            empty = np.empty((0, 2), dtype=np.float32)
+            return CornerResult(
+                False, empty, empty,
+                "Chessboard corners not found in one or both images. "
+                "Check pattern_size.")
+        return CornerResult(True, pts1, pts2)
+
+
+def corner_detection(img1: np.ndarray,
+                     img2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find sub-pixel chessboard corners in a stereo pair, raising RuntimeError
+    when the board is not found in both images.
+    """
+    # A one-off pair gains nothing from a thread pool that would be started
+    # and shut down for it, search the two images in turn.
+    result = ChessboardDetector(concurrent=False).detect(img1, img2)
+    if not result.found:
+        raise RuntimeError(result.message)
+    return result.pts1, result.pts2
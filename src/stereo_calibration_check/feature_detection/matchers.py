@@ -0,0 +1,141 @@
+"""
+Reusable feature detectors and descriptor matchers.
+"""
+import cv2 as cv
+import numpy as np
+
+from ..utils.profiling import timed
+
+DETECTORS = ('sift', 'orb', 'akaze')
+
+
+def _create_detector(name: str, max_features: int) -> cv.Feature2D:
+    if name == 'sift':
+        return cv.SIFT_create()
+    if name == 'orb':
+        return cv.ORB_create(nfeatures=max_features)
+    if name == 'akaze':
+        return cv.AKAZE_create()
+    raise ValueError(f"Unknown detector '{name}', expected one of {DETECTORS}")
+
+
+def _ratio_test(distances: np.ndarray, ratio: float) -> np.ndarray:
+    """
+    Lowe's ratio test on (N, 2) nearest and second nearest distances.
+    """
+    return distances[:, 0] < ratio * distances[:, 1]
+
+
+def _knn_table(matches) -> np.ndarray:
+    """
+    Flatten k=2 knnMatch results into an (N, 4) array of query index, train
+    index, nearest and second nearest distance.
+    """
+    return np.array([(m.queryIdx, m.trainIdx, m.distance, n.distance)
+                     for m, n in (pair for pair in matches if len(pair) == 2)],
+                    dtype=np.float64).reshape(-1, 4)
+
+
+class FeatureMatcher:
+    """
+    Detector and matcher pair created once and reused for every frame.
+
+    Float descriptors (SIFT) are matched with a FLANN KD-tree, binary ones
+    (ORB, AKAZE) with a brute-force Hamming matcher. With row_band set, the
+    images are assumed rectified and each keypoint is only compared with
+    keypoints within row_band pixels in y of it.
+    """
+
+    def __init__(self, detector: str = 'sift', ratio: float = 0.8,
+                 row_band: float | None = None, max_features: int = 5000):
+        self.detector_name = detector
+        self.detector = _create_detector(detector, max_features)
+        self.binary = detector != 'sift'
+        self.ratio = ratio
+        self.row_band = row_band
+        self.band_matcher = cv.BFMatcher(
+            cv.NORM_HAMMING if self.binary else cv.NORM_L2)
+        if self.binary:
+            self.matcher = self.band_matcher
+        else:
+            # FLANN parameters
+            FLANN_INDEX_KDTREE = 1
+            index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
+            search_params = dict(checks=50)
+            self.matcher = cv.FlannBasedMatcher(index_params, search_params)
+
+    @timed('detect')
+    def detect(self, image: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        Return float32 (N, 2) keypoint locations and their descriptors.
+        """
+        kp, des = self.detector.detectAndCompute(image, None)
+        pts = cv.KeyPoint_convert(kp).reshape(-1, 2) if kp else np.empty(
+            (0, 2), dtype=np.float32)
+        return pts, des
+
+    def match(self, image1: np.ndarray,
+              image2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Detect and match features, returning float32 (N, 2) point arrays.
+        """
+        pts1, des1 = self.detect(image1)
+        pts2, des2 = self.detect(image2)
+        idx1, idx2 = self.match_descriptors(pts1, des1, pts2, des2)
+        return pts1[idx1], pts2[idx2]
+
+    @timed('match')
+    def match_descriptors(self, pts1: np.ndarray, des1: np.ndarray | None,
+                          pts2: np.ndarray, des2: np.ndarray | None
+                          ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the indices of the matches that pass the ratio test.
+        """
+        if des1 is None or des2 is None or len(des1) == 0 or len(des2) < 2:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        if self.row_band is not None:
+            return self._match_row_band(pts1, des1, pts2, des2)
+        return self._match_global(des1, des2)
+
+    def _match_global(self, des1: np.ndarray,
+                      des2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        table = _knn_table(self.matcher.knnMatch(des1, des2, k=2))
+        good = _ratio_test(table[:, 2:], self.ratio)
+        return (table[good, 0].astype(np.intp),
+                table[good, 1].astype(np.intp))
+
+    def _match_row_band(self, pts1: np.ndarray, des1: np.ndarray,
+                        pts2: np.ndarray, des2: np.ndarray,
+                        chunk: int = 128) -> tuple[np.ndarray, np.ndarray]:
+        order1 = np.argsort(pts1[:, 1], kind='stable')
+        order2 = np.argsort(pts2[:, 1], kind='stable')
+        y2 = pts2[order2, 1]
+        des2 = des2[order2]
+
+        idx1 = []
+        idx2 = []
+        # Queries sorted by y, so each chunk only needs the train keypoints
+        # in a narrow band of rows, and the mask restricts every query to
+        # its own band.
+        for start in range(0, len(order1), chunk):
+            query = order1[start:start + chunk]
+            y1 = pts1[query, 1]
+            lo = np.searchsorted(y2, y1[0] - self.row_band, side='left')
+            hi = np.searchsorted(y2, y1[-1] + self.row_band, side='right')
+            if hi - lo < 2:
+                continue
+            band = np.abs(y1[:, np.newaxis] -
+                          y2[np.newaxis, lo:hi]) <= self.row_band
+            matches = self.band_matcher.knnMatch(des1[query], des2[lo:hi],
+                                                 k=2,
+                                                 mask=band.view(np.uint8))
+            table = _knn_table(matches)
+            good = _ratio_test(table[:, 2:], self.ratio)
+            idx1.append(query[table[good, 0].astype(np.intp)])
+            idx2.append(order2[lo + table[good, 1].astype(np.intp)])
+
+        if not idx1:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        return np.concatenate(idx1), np.concatenate(idx2)
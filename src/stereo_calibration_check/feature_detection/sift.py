@@ -1,36 +1,36 @@
+import threading
+
 import cv2 as cv
 import numpy as np
 
+from .matchers import FeatureMatcher
 
-def sift_feature_detection(image1: cv.Mat,
-                           image2: cv.Mat) -> tuple[cv.Mat, cv.Mat]:
-    """
-    Detects SIFT features in two images and matches them using FLANN-based matcher.
-    """
-    sift = cv.SIFT_create()
-
-    # find the keypoints and descriptors with SIFT
-    kp1, des1 = sift.detectAndCompute(image1, None)
-    kp2, des2 = sift.detectAndCompute(image2, None)
-
-    # FLANN parameters
-    FLANN_INDEX_KDTREE = 1
-    index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-    search_params = dict(checks=50)
+# Detector and FLANN matcher are reused across calls, one per thread since
+# the matcher keeps per-call state.
+_local = threading.local()
 
-    flann = cv.FlannBasedMatcher(index_params, search_params)
-    matches = flann.knnMatch(des1, des2, k=2)
 
-    pts1 = []
-    pts2 = []
+def get_default_matcher() -> FeatureMatcher:
+    """
+    Return this thread's shared SIFT + FLANN matcher.
+    """
+    matcher = getattr(_local, 'matcher', None)
+    if matcher is None:
+        matcher = _local.matcher = FeatureMatcher('sift')
+    return matcher
 
-    # ratio test as per Lowe's paper
-    for i, (m, n) in enumerate(matches):
-        if m.distance < 0.8 * n.distance:
-            pts2.append(kp2[m.trainIdx].pt)
-            pts1.append(kp1[m.queryIdx].pt)
 
-    pts1 = np.int32(pts1)
-    pts2 = np.int32(pts2)
+def sift_feature_detection(image1: cv.Mat,
+                           image2: cv.Mat,
+                           matcher: FeatureMatcher | None = None
+                           ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Detects SIFT features in two images and matches them using FLANN-based matcher.
 
-    return pts1, pts2
+    Returns float32 (N, 2) arrays of sub-pixel matched point locations. A
+    different FeatureMatcher (e.g. ORB, AKAZE or row-band matching) can be
+    passed in instead of the default one.
+    """
+    if matcher is None:
+        matcher = get_default_matcher()
+    return matcher.match(image1, image2)
@@ -1,12 +1,20 @@
 from .calibrate.stereo_calibrate import get_projection_matrix
-from .calibrate.undistort import rectify_image
-from .calibrate.distort import distort_image
+from .calibrate.undistort import Rectifier
+from .calibrate.distort import Redistorter
+from .calibrate.map_cache import default_cache_dir, default_map_cache
+from .pipeline.batch import add_batch_arguments, run_batch
+from .pipeline.multi import add_multi_arguments, run_multi
+from .pipeline.round_trip import add_round_trip_arguments, run_round_trip
+from .pipeline.stream import add_stream_arguments, run_stream
 from .epipolar_calibration_check.epipolar_line import draw_epilines_sift as draw_epilines
+from .utils import profiling
 from .utils.file_utils import load_intrinsics
-from .utils.visualization import display_images_side_by_side
+from .utils.visualization import ImageWriter, display_images_side_by_side
 
+from contextlib import nullcontext
 import cv2
 import argparse
+import cProfile
 
 def main():
     parser = argparse.ArgumentParser(description="Stereo Recalibration Example")
@@ -18,42 +26,111 @@ def main():
                         help='Path to the left camera calibration file')
     parser.add_argument('--right_calib', type=str, default='data/calibration/thermal_right.yaml',
                         help='Path to the right camera calibration file')
+    parser.add_argument('--map_cache_dir', type=str, default=default_cache_dir(),
+                        help='Directory for persisted remap tables')
+    parser.add_argument('--no_map_cache', action='store_true',
+                        help='Do not read or write persisted remap tables')
+    parser.add_argument('--output_dir', type=str, default=None,
+                        help='Write the figures to this directory instead of '
+                        'displaying them')
+    parser.add_argument('--image_format', type=str, default='png', choices=['png', 'jpg'],
+                        help='Format of the written figures')
+    parser.add_argument('--jpeg_quality', type=int, default=95,
+                        help='JPEG quality of the written figures, 0-100')
+    parser.add_argument('--png_compression', type=int, default=3,
+                        help='PNG compression level of the written figures, 0-9')
+    parser.add_argument('--metrics_out', type=str, default=None,
+                        help='Record per-stage timings and write them to this '
+                        'file, Prometheus text for .prom/.txt, JSON otherwise')
+    parser.add_argument('--profile_out', type=str, default=None,
+                        help='Write cProfile stats of the main process to this file')
+    subparsers = parser.add_subparsers(dest='command')
+    batch_parser = subparsers.add_parser(
+        'batch', help='Headless check of many left/right frame pairs')
+    add_batch_arguments(batch_parser)
+    stream_parser = subparsers.add_parser(
+        'stream', help='Headless check of paired video files or image sequences')
+    add_stream_arguments(stream_parser)
+    multi_parser = subparsers.add_parser(
+        'rig', help='Headless check of every camera pair of a multi-camera rig')
+    add_multi_arguments(multi_parser)
+    round_trip_parser = subparsers.add_parser(
+        'roundtrip', help='Numeric distort -> re-rectify round trip check')
+    add_round_trip_arguments(round_trip_parser)
     args = parser.parse_args()
 
+    if args.metrics_out is not None:
+        profiling.enable()
+    profiler = cProfile.Profile() if args.profile_out is not None else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        if args.command == 'batch':
+            return run_batch(args)
+        if args.command == 'stream':
+            return run_stream(args)
+        if args.command == 'rig':
+            return run_multi(args)
+        if args.command == 'roundtrip':
+            return run_round_trip(args)
+        return run_interactive(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile_out)
+        if args.metrics_out is not None:
+            profiling.write_metrics(args.metrics_out)
+
+
+def run_interactive(args: argparse.Namespace) -> None:
+    """
+    Show the rectified pair, its epilines and the distort/re-rectify round
+    trip of one hard-coded image pair, or write the figures to output_dir.
+    """
+    if not args.no_map_cache:
+        default_map_cache.cache_dir = args.map_cache_dir
+
     intrinsics1 = load_intrinsics(args.left_calib)
     intrinsics2 = load_intrinsics(args.right_calib)
 
     R1, R2, P1, P2 = get_projection_matrix(intrinsics1, intrinsics2)
+    rectifier1 = Rectifier(intrinsics1, R1, P1)
+    rectifier2 = Rectifier(intrinsics2, R2, P2)
+    redistorter1 = Redistorter(intrinsics1, intrinsics1['P'])
+    redistorter2 = Redistorter(intrinsics2, intrinsics2['P'])
+
+    writer = None
+    if args.output_dir is not None:
+        writer = ImageWriter(args.output_dir, args.image_format,
+                             args.jpeg_quality, args.png_compression)
+    with writer or nullcontext():
+        show = (display_images_side_by_side if writer is None else
+                writer.submit_side_by_side)
+        rect_image1 = cv2.imread(args.left_image,
+                                 cv2.IMREAD_GRAYSCALE)
+        rect_image2 = cv2.imread(args.right_image,
+                                 cv2.IMREAD_GRAYSCALE)
+        show(rect_image1, rect_image2, 'Rectified Images')
+
+        epiline_image1, epiline_image2 = draw_epilines(rect_image1, rect_image2)
+        show(epiline_image1, epiline_image2,
+             'Epilines on Rectified Images')
+
+        distorted_image1 = redistorter1(rect_image1)
+        distorted_image2 = redistorter2(rect_image2)
+        show(distorted_image1, distorted_image2,
+             'Distorted Back Images')
+
+        epiline_distorted_image1, epiline_distorted_image2 = draw_epilines(
+            distorted_image1, distorted_image2)
+        show(epiline_distorted_image1,
+             epiline_distorted_image2,
+             'Epilines on Distorted Back Images')
 
-    rect_image1 = cv2.imread(args.left_image,
-                             cv2.IMREAD_GRAYSCALE)
-    rect_image2 = cv2.imread(args.right_image,
-                             cv2.IMREAD_GRAYSCALE)
-    display_images_side_by_side(rect_image1, rect_image2, 'Rectified Images')
-
-    epiline_image1, epiline_image2 = draw_epilines(rect_image1, rect_image2)
-    display_images_side_by_side(epiline_image1, epiline_image2,
-                                'Epilines on Rectified Images')
-
-    distorted_image1 = distort_image(rect_image1, intrinsics1,
-                                     intrinsics1['P'])
-    distorted_image2 = distort_image(rect_image2, intrinsics2,
-                                     intrinsics2['P'])
-    display_images_side_by_side(distorted_image1, distorted_image2,
-                                'Distorted Back Images')
-
-    epiline_distorted_image1, epiline_distorted_image2 = draw_epilines(
-        distorted_image1, distorted_image2)
-    display_images_side_by_side(epiline_distorted_image1,
-                                epiline_distorted_image2,
-                                'Epilines on Distorted Back Images')
-
-    rectified_back_image1 = rectify_image(distorted_image1, None, intrinsics1,
-                                          R1, P1)
-    rectified_back_image2 = rectify_image(distorted_image2, None, intrinsics2,
-                                          R2, P2)
-    epiline_rectified_back_image1, epiline_rectified_back_image2 = draw_epilines(
-        rectified_back_image1, rectified_back_image2)
-    display_images_side_by_side(epiline_rectified_back_image1,
-                                epiline_rectified_back_image2,
-                                'Epilines on Rectified Back Images')
+        rectified_back_image1 = rectifier1(distorted_image1)
+        rectified_back_image2 = rectifier2(distorted_image2)
+        epiline_rectified_back_image1, epiline_rectified_back_image2 = draw_epilines(
+            rectified_back_image1, rectified_back_image2)
+        show(epiline_rectified_back_image1,
+             epiline_rectified_back_image2,
+             'Epilines on Rectified Back Images')
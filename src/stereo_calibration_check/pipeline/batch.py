@@ -0,0 +1,327 @@
+"""
+Headless batch check of many left/right frame pairs using a process pool.
+"""
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+import cv2
+import numpy as np
+
+from ..calibrate.map_cache import default_map_cache
+from ..calibrate.registry import CalibrationRegistry, RigCalibration
+from ..calibrate.undistort import Rectifier
+from ..epipolar_calibration_check.block_disparity import (DisparityMap,
+                                                          compute_block_disparity)
+from ..epipolar_calibration_check.coarse_to_fine import CoarseToFineCheck
+from ..epipolar_calibration_check.epipolar_error import (EpipolarError,
+                                                         compute_epipolar_error)
+from ..epipolar_calibration_check.fundamental import METHODS
+from ..feature_detection.matchers import DETECTORS, FeatureMatcher
+from ..utils import profiling
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+CHECKERS = ('features', 'block')
+
+# Per-process state set up once by _init_worker.
+_worker_state = {}
+
+
+def collect_frames(pattern: str) -> list[str]:
+    """
+    Return the sorted image paths in a directory or matching a glob pattern.
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern)
+    return sorted(path for path in paths
+                  if path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def _frame_key(path: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'(?i)left|right', '', stem)
+
+
+def _frame_timestamp(path: str) -> float | None:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    numbers = re.findall(r'\d+(?:\.\d+)?', stem)
+    return float(numbers[-1]) if numbers else None
+
+
+def pair_frames(left_paths: list[str], right_paths: list[str],
+                max_time_diff: float | None = None) -> list[tuple[str, str]]:
+    """
+    Pair left and right frames.
+
+    By default frames are paired by file name with any 'left'/'right' token
+    removed. With max_time_diff, the last number in each file name is used as
+    a timestamp and every left frame is paired with the nearest right frame
+    no further than max_time_diff away.
+    """
+    if max_time_diff is None:
+        right_by_key = {_frame_key(path): path for path in right_paths}
+        return [(path, right_by_key[_frame_key(path)]) for path in left_paths
+                if _frame_key(path) in right_by_key]
+
+    right = [(t, path) for path in right_paths
+             if (t := _frame_timestamp(path)) is not None]
+    if not right:
+        return []
+    right.sort()
+    right_times = np.array([t for t, _ in right])
+
+    pairs = []
+    for path in left_paths:
+        t = _frame_timestamp(path)
+        if t is None:
+            continue
+        i = int(np.searchsorted(right_times, t))
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(right_times)]
+        j = min(candidates, key=lambda j: abs(right_times[j] - t))
+        if abs(right_times[j] - t) <= max_time_diff:
+            pairs.append((path, right[j][1]))
+    return pairs
+
+
+def load_rig(args: argparse.Namespace) -> RigCalibration:
+    """
+    Return the rig selected with --calib_dir/--rig_name, or the one made of
+    --left_calib and --right_calib.
+    """
+    if args.rig_name is not None:
+        return CalibrationRegistry(args.calib_dir).get(args.rig_name)
+    return RigCalibration.from_files(args.left_calib, args.right_calib)
+
+
+def build_rectifiers(rig: RigCalibration, strip_rows: int | None = None
+                     ) -> tuple[Rectifier, Rectifier]:
+    """
+    Return the rectifiers of a rig with their maps, or the maps of all their
+    strips of strip_rows rows, already built.
+    """
+    rectifier1, rectifier2 = rig.rectifiers(strip_rows=strip_rows)
+    # Build (or load) the maps up front so no frame pays for them.
+    rectifier1.prepare((rig.left.width, rig.left.height))
+    rectifier2.prepare((rig.right.width, rig.right.height))
+    return rectifier1, rectifier2
+
+
+def prewarm_map_cache(args: argparse.Namespace,
+                      rigs: list[RigCalibration], options: dict) -> str | None:
+    """
+    Persist the maps of every rig to the map cache directory selected on the
+    command line, so worker processes only memory-map them. Returns the
+    directory to hand to the workers, None without a usable one.
+    """
+    if args.no_map_cache:
+        return None
+    default_map_cache.cache_dir = args.map_cache_dir
+    for rig in rigs:
+        make_check(build_rectifiers(rig, args.strip_rows), **options)
+    # None when the directory turned out not to be writable.
+    return default_map_cache.cache_dir
+
+
+def make_check(rectifiers: tuple[Rectifier, Rectifier] | None,
+               detector: str = 'sift', row_band: float | None = None,
+               coarse_scale: float | None = None, threshold: float = 1.0,
+               f_method: str = 'lmeds', max_matches: int | None = None,
+               checker: str = 'features'
+               ) -> Callable[[np.ndarray, np.ndarray],
+                             EpipolarError | DisparityMap]:
+    """
+    Return a function checking one frame pair, rectifying it first when
+    rectifiers are given.
+
+    checker 'features' measures the epipolar error of feature matches,
+    'block' the dense vertical disparity map from block correlation.
+    """
+    if checker == 'block':
+
+        def block_check(img1: np.ndarray, img2: np.ndarray) -> DisparityMap:
+            if rectifiers is not None:
+                img1 = rectifiers[0](img1)
+                img2 = rectifiers[1](img2)
+            return compute_block_disparity(img1, img2)
+
+        return block_check
+
+    matcher = FeatureMatcher(detector, row_band=row_band)
+    if coarse_scale is not None:
+        check = CoarseToFineCheck(threshold, coarse_scale, matcher=matcher,
+                                  rectifiers=rectifiers, method=f_method,
+                                  max_matches=max_matches)
+        for rectifier in check.coarse_rectifiers or ():
+            rectifier.prepare(rectifier.output_size)
+        return check
+
+    def check(img1: np.ndarray, img2: np.ndarray) -> EpipolarError:
+        if rectifiers is not None:
+            img1 = rectifiers[0](img1)
+            img2 = rectifiers[1](img2)
+        return compute_epipolar_error(img1, img2, matcher=matcher,
+                                      method=f_method, max_matches=max_matches)
+
+    return check
+
+
+def _init_worker(rig: RigCalibration | None, strip_rows: int | None,
+                 map_cache_dir: str | None, check_options: dict,
+                 metrics: bool) -> None:
+    default_map_cache.cache_dir = map_cache_dir
+    # Forked workers inherit the histograms of the parent, which reports
+    # its own stages itself.
+    profiling.reset()
+    profiling.enable(metrics)
+    # The rig arrives already parsed and rectified from the parent.
+    rectifiers = (build_rectifiers(rig, strip_rows) if rig is not None else
+                  None)
+    _worker_state['check'] = make_check(rectifiers, **check_options)
+
+
+def _process_pair(left_path: str, right_path: str) -> dict:
+    record = {'left': left_path, 'right': right_path}
+    img1 = cv2.imread(left_path, cv2.IMREAD_GRAYSCALE)
+    img2 = cv2.imread(right_path, cv2.IMREAD_GRAYSCALE)
+    if img1 is None or img2 is None:
+        record['error'] = 'failed to read image'
+        return record
+
+    try:
+        record.update(_worker_state['check'](img1, img2).as_dict())
+    except Exception as e:
+        # One bad pair must not abort the run, report it and go on.
+        record['error'] = str(e)
+    if profiling.is_enabled():
+        # Shipped back to the parent and merged there.
+        record['metrics'] = profiling.drain()
+    return record
+
+
+def add_check_arguments(parser: argparse.ArgumentParser,
+                        calibration: bool = True) -> None:
+    """
+    Add the check options shared by the headless modes, and the stereo pair
+    calibration options unless calibration is False.
+    """
+    if calibration:
+        parser.add_argument('--left_calib', type=str, default='data/calibration/thermal_left.yaml',
+                            help='Path to the left camera calibration file')
+        parser.add_argument('--right_calib', type=str, default='data/calibration/thermal_right.yaml',
+                            help='Path to the right camera calibration file')
+        parser.add_argument('--calib_dir', type=str, default='data/calibration',
+                            help='Directory of <rig>_left.yaml / <rig>_right.yaml '
+                            'calibrations')
+        parser.add_argument('--rig_name', type=str, default=None,
+                            help='Rig of --calib_dir to use instead of '
+                            '--left_calib and --right_calib')
+    parser.add_argument('--rectify', action='store_true',
+                        help='Frames are raw fisheye images and must be rectified first')
+    parser.add_argument('--strip_rows', type=int, default=None,
+                        help='Rectify in strips of this many rows to bound '
+                        'memory on large frames')
+    parser.add_argument('--checker', type=str, default='features', choices=CHECKERS,
+                        help='features: epipolar error of feature matches, '
+                        'block: dense vertical disparity from block correlation')
+    parser.add_argument('--detector', type=str, default='sift', choices=DETECTORS,
+                        help='Feature detector used for matching')
+    parser.add_argument('--row_band', type=float, default=None,
+                        help='Only match features within this many rows of '
+                        'each other')
+    parser.add_argument('--coarse_scale', type=float, default=None,
+                        help='Check a downscaled pair first, e.g. 0.5, and only '
+                        'go to full resolution near the threshold')
+    parser.add_argument('--threshold', type=float, default=1.0,
+                        help='Median vertical error in pixels above which the '
+                        'rig is considered out of calibration')
+    parser.add_argument('--f_method', type=str, default='lmeds', choices=METHODS,
+                        help='Fundamental matrix estimator, auto accepts the '
+                        'ideal rectified geometry when the matches fit it and '
+                        'is much faster than lmeds')
+    parser.add_argument('--max_matches', type=int, default=None,
+                        help='Fit the fundamental matrix on at most this many '
+                        'randomly sampled matches')
+    parser.add_argument('--output', type=str, default='-',
+                        help='JSON lines output file, - for stdout')
+
+
+def check_options(args: argparse.Namespace) -> dict:
+    """
+    Return the make_check keyword arguments selected on the command line.
+    """
+    return dict(detector=args.detector, row_band=args.row_band,
+                coarse_scale=args.coarse_scale, threshold=args.threshold,
+                f_method=args.f_method, max_matches=args.max_matches,
+                checker=args.checker)
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--left_frames', type=str, required=True,
+                        help='Directory or glob pattern of left frames')
+    parser.add_argument('--right_frames', type=str, required=True,
+                        help='Directory or glob pattern of right frames')
+    parser.add_argument('--max_time_diff', type=float, default=None,
+                        help='Pair frames by the timestamp in their file name '
+                        'instead of by name, within this tolerance')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes')
+    add_check_arguments(parser)
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """
+    Check every left/right pair and stream one JSON record per pair.
+    """
+    pairs = pair_frames(collect_frames(args.left_frames),
+                        collect_frames(args.right_frames),
+                        args.max_time_diff)
+    if not pairs:
+        print("Error: no left/right frame pairs found.", file=sys.stderr)
+        return 1
+
+    options = check_options(args)
+    rig = load_rig(args) if args.rectify else None
+    map_cache_dir = prewarm_map_cache(args, [rig] if rig is not None else [],
+                                      options)
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    # Keep a bounded number of pairs in flight so memory does not grow with
+    # the number of frames.
+    max_pending = 2 * args.workers
+    num_errors = 0
+    try:
+        with ProcessPoolExecutor(
+                max_workers=args.workers, initializer=_init_worker,
+                initargs=(rig, args.strip_rows, map_cache_dir, options,
+                          profiling.is_enabled())) as executor:
+            pending = set()
+            pair_iter = iter(pairs)
+            while True:
+                for left_path, right_path in pair_iter:
+                    pending.add(executor.submit(_process_pair, left_path,
+                                                right_path))
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    if 'metrics' in record:
+                        profiling.merge(record.pop('metrics'))
+                    num_errors += 'error' in record
+                    output.write(json.dumps(record) + '\n')
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"Checked {len(pairs)} pairs, {num_errors} failed.", file=sys.stderr)
+    return 0
@@ -0,0 +1,193 @@
+"""
+Headless check of every configured camera pair of a multi-camera rig.
+
+Each capture (one frame per camera) is decoded once in the parent process
+into a slot of shared memory. Worker processes check one camera pair per
+task and read both frames from shared memory without copying, so a camera
+shared by several pairs is neither decoded nor transferred more than once.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import json
+import os
+import re
+import sys
+
+import cv2
+
+from ..calibrate.map_cache import default_map_cache
+from ..calibrate.multi_rig import MultiCameraRig
+from ..utils import profiling
+from .batch import (add_check_arguments, build_rectifiers, check_options,
+                    collect_frames, make_check, prewarm_map_cache)
+from .shared_frames import SharedFrame, SharedFramePool, attach
+
+# Per-process state set up once by _init_worker.
+_worker_state = {}
+
+
+def _capture_key(path: str, camera: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(rf'[_-]?{re.escape(camera)}[_-]?', '', stem,
+                  flags=re.IGNORECASE)
+
+
+def collect_captures(camera_frames: dict[str, str]
+                     ) -> list[tuple[str, dict[str, str]]]:
+    """
+    Group the frames of each camera into captures by file name, ignoring
+    the camera name in it, and return (key, {camera: path}) for the keys
+    present for every camera, in order.
+    """
+    by_camera = {
+        camera: {_capture_key(path, camera): path
+                 for path in collect_frames(pattern)}
+        for camera, pattern in camera_frames.items()
+    }
+    keys = set.intersection(*(set(paths) for paths in by_camera.values()))
+    return [(key, {camera: paths[key] for camera, paths in by_camera.items()})
+            for key in sorted(keys)]
+
+
+def _init_worker(rig: MultiCameraRig, rectify: bool, strip_rows: int | None,
+                 map_cache_dir: str | None, check_options: dict,
+                 metrics: bool) -> None:
+    default_map_cache.cache_dir = map_cache_dir
+    # Forked workers inherit the histograms of the parent, which reports
+    # its own stages itself.
+    profiling.reset()
+    profiling.enable(metrics)
+    _worker_state['checks'] = {
+        name: make_check(build_rectifiers(pair, strip_rows) if rectify else
+                         None, **check_options)
+        for name, pair in rig.pairs.items()
+    }
+
+
+def _check_pair(capture: str, pair: str, frame1: SharedFrame,
+                frame2: SharedFrame) -> dict:
+    record = {'capture': capture, 'pair': pair}
+    try:
+        result = _worker_state['checks'][pair](attach(frame1), attach(frame2))
+        record.update(result.as_dict())
+    except Exception as e:
+        # One bad pair must not abort the run, report it and go on.
+        record['error'] = str(e)
+    if profiling.is_enabled():
+        record['metrics'] = profiling.drain()
+    return record
+
+
+def _parse_camera_frames(values: list[str]) -> dict[str, str]:
+    camera_frames = {}
+    for value in values:
+        camera, sep, pattern = value.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(
+                f"Expected CAMERA=FRAMES, got '{value}'")
+        camera_frames[camera] = pattern
+    return camera_frames
+
+
+def add_multi_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--rig_file', type=str, required=True,
+                        help='YAML file listing the cameras and pairs of the rig')
+    parser.add_argument('--camera_frames', type=str, nargs='+', required=True,
+                        metavar='CAMERA=FRAMES',
+                        help='Directory or glob pattern of the frames of each '
+                        'camera')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes')
+    add_check_arguments(parser, calibration=False)
+
+
+def run_multi(args: argparse.Namespace) -> int:
+    """
+    Check every configured pair of every capture and stream one JSON record
+    per (capture, pair).
+    """
+    rig = MultiCameraRig.from_file(args.rig_file)
+    camera_frames = _parse_camera_frames(args.camera_frames)
+    missing = set(rig.cameras) - set(camera_frames)
+    if missing:
+        print(f"Error: no frames given for cameras {sorted(missing)}.",
+              file=sys.stderr)
+        return 1
+    captures = collect_captures(
+        {camera: camera_frames[camera] for camera in rig.cameras})
+    if not captures:
+        print("Error: no captures found with a frame of every camera.",
+              file=sys.stderr)
+        return 1
+
+    options = check_options(args)
+    map_cache_dir = prewarm_map_cache(
+        args, list(rig.pairs.values()) if args.rectify else [], options)
+
+    shapes = {camera: (calibration.height, calibration.width)
+              for camera, calibration in rig.cameras.items()}
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    num_records = 0
+    num_errors = 0
+
+    def write(record: dict) -> None:
+        nonlocal num_records, num_errors
+        if 'metrics' in record:
+            profiling.merge(record.pop('metrics'))
+        num_records += 1
+        num_errors += 'error' in record
+        output.write(json.dumps(record) + '\n')
+
+    # Two captures per worker in flight keep the workers busy while the
+    # parent decodes the next one.
+    num_slots = 2 * args.workers
+    try:
+        with SharedFramePool(shapes, num_slots) as pool, ProcessPoolExecutor(
+                max_workers=args.workers, initializer=_init_worker,
+                initargs=(rig, args.rectify, args.strip_rows, map_cache_dir,
+                          options, profiling.is_enabled())) as executor:
+            free_slots = list(range(num_slots))
+            # Tasks still reading each slot.
+            readers = [0] * num_slots
+            pending = {}
+
+            def collect() -> None:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    slot = pending.pop(future)
+                    readers[slot] -= 1
+                    if readers[slot] == 0:
+                        free_slots.append(slot)
+                    write(future.result())
+                output.flush()
+
+            for key, paths in captures:
+                while not free_slots:
+                    collect()
+                slot = free_slots.pop()
+                try:
+                    frames = {}
+                    for camera, path in paths.items():
+                        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+                        if image is None:
+                            raise ValueError(f"failed to read {path}")
+                        frames[camera] = pool.write(slot, camera, image)
+                except ValueError as e:
+                    free_slots.append(slot)
+                    write({'capture': key, 'error': str(e)})
+                    continue
+
+                for name, (left, right) in rig.pair_cameras.items():
+                    future = executor.submit(_check_pair, key, name,
+                                             frames[left], frames[right])
+                    pending[future] = slot
+                    readers[slot] += 1
+            while pending:
+                collect()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"Checked {len(captures)} captures of {len(rig.pairs)} pairs, "
+          f"{num_errors} of {num_records} records failed.", file=sys.stderr)
+    return 0
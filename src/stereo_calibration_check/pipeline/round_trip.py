@@ -0,0 +1,84 @@
+"""
+Headless distort -> re-rectify round trip consistency check.
+"""
+import argparse
+import json
+import sys
+
+import cv2
+
+from ..calibrate.map_cache import default_map_cache
+from ..calibrate.round_trip import RoundTripCheck, json_record
+from ..utils.file_utils import load_intrinsics
+from .batch import collect_frames
+
+
+def _exceeds(value: float | None, limit: float | None) -> bool:
+    # A missing or NaN value (no valid pixels) fails any limit.
+    return limit is not None and not (value is not None and value <= limit)
+
+
+def add_round_trip_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--calib', type=str, default='data/calibration/thermal_left.yaml',
+                        help='Path to the camera calibration file')
+    parser.add_argument('--frames', type=str, default=None,
+                        help='Directory or glob pattern of rectified frames; '
+                        'without frames only the geometric error is reported')
+    parser.add_argument('--grid', type=int, nargs=2, default=(8, 6),
+                        metavar=('COLS', 'ROWS'),
+                        help='Regions of the per-region error')
+    parser.add_argument('--max_shift', type=float, default=None,
+                        help='Fail when the max geometric error in pixels '
+                        'exceeds this')
+    parser.add_argument('--max_mean_error', type=float, default=None,
+                        help='Fail when the mean intensity error of a frame '
+                        'exceeds this')
+    parser.add_argument('--output', type=str, default='-',
+                        help='JSON lines output file, - for stdout')
+
+
+def run_round_trip(args: argparse.Namespace) -> int:
+    """
+    Write one JSON record per frame, or one for the calibration alone, and
+    return 1 when a threshold is exceeded so the mode can gate regressions.
+    """
+    if not args.no_map_cache:
+        default_map_cache.cache_dir = args.map_cache_dir
+    intrinsics = load_intrinsics(args.calib)
+    check = RoundTripCheck(intrinsics, grid=tuple(args.grid))
+
+    def records():
+        if args.frames is None:
+            size = (intrinsics['width'], intrinsics['height'])
+            _, mean_shift, max_shift, valid_ratio = check.geometry(size)
+            yield json_record({'calib': args.calib, 'mean_shift': mean_shift,
+                               'max_shift': max_shift,
+                               'valid_ratio': valid_ratio})
+            return
+        for path in collect_frames(args.frames):
+            frame = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if frame is None:
+                yield {'frame': path, 'error': 'failed to read image'}
+                continue
+            yield {'frame': path, **check.check(frame).as_dict()}
+
+    total = 0
+    failed = 0
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        for record in records():
+            total += 1
+            failed += ('error' in record or
+                       _exceeds(record.get('max_shift'), args.max_shift) or
+                       ('mean_error' in record and
+                        _exceeds(record['mean_error'], args.max_mean_error)))
+            output.write(json.dumps(record) + '\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if failed:
+        print(f"{failed} of {total} round trip checks failed.",
+              file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,96 @@
+"""
+Frames in shared memory, written once by the parent process and read
+without copying by any number of worker processes.
+"""
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Segments attached by this process, kept open for the life of the process
+# so later frames in the same slot need no new mapping.
+_attached: dict[str, shared_memory.SharedMemory] = {}
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """
+    Picklable handle on a frame stored in a shared memory segment.
+    """
+    name: str
+    shape: tuple[int, ...]
+    dtype: str = 'uint8'
+
+
+def attach(frame: SharedFrame) -> np.ndarray:
+    """
+    Return a read-only array viewing the frame in shared memory.
+    """
+    shm = _attached.get(frame.name)
+    if shm is None:
+        shm = _attached[frame.name] = shared_memory.SharedMemory(frame.name)
+    array = np.ndarray(frame.shape, frame.dtype, buffer=shm.buf)
+    array.flags.writeable = False
+    return array
+
+
+class SharedFramePool:
+    """
+    Fixed set of slots, each holding one frame per camera in shared memory.
+
+    The owner writes the frames of a capture into a free slot and hands the
+    SharedFrame handles to workers; a slot must not be written again until
+    every worker reading it is done. Segments are unlinked on close.
+    """
+
+    def __init__(self, shapes: dict[str, tuple[int, ...]], slots: int,
+                 dtype: str = 'uint8'):
+        self.shapes = shapes
+        self.dtype = dtype
+        self._segments = []
+        self._frames: list[dict[str, SharedFrame]] = []
+        self._arrays: list[dict[str, np.ndarray]] = []
+        try:
+            for _ in range(slots):
+                frames = {}
+                arrays = {}
+                for camera, shape in shapes.items():
+                    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+                    shm = shared_memory.SharedMemory(create=True, size=size)
+                    self._segments.append(shm)
+                    frames[camera] = SharedFrame(shm.name, tuple(shape), dtype)
+                    arrays[camera] = np.ndarray(shape, dtype, buffer=shm.buf)
+                self._frames.append(frames)
+                self._arrays.append(arrays)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> 'SharedFramePool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def slots(self) -> int:
+        return len(self._frames)
+
+    def write(self, slot: int, camera: str, image: np.ndarray) -> SharedFrame:
+        """
+        Copy image into the buffer of camera in slot and return its handle.
+        """
+        array = self._arrays[slot][camera]
+        if image.shape != array.shape:
+            raise ValueError(f"Frame of {camera} has shape {image.shape}, "
+                             f"expected {array.shape}")
+        np.copyto(array, image, casting='unsafe')
+        return self._frames[slot][camera]
+
+    def close(self) -> None:
+        # Drop the views first, a segment with exported buffers cannot close.
+        self._arrays = []
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments = []
@@ -0,0 +1,297 @@
+"""
+Streaming check of paired video files or image sequences.
+
+Frames are decoded in a reader thread, rectified and checked in worker
+threads (OpenCV releases the GIL) and handed over through bounded queues, so
+memory stays flat regardless of the stream length.
+"""
+from collections.abc import Callable, Iterable, Iterator
+import argparse
+import json
+import queue
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+from ..calibrate.map_cache import default_map_cache
+from ..calibrate.online import OnlineRecalibrator, rotation_angle
+from ..epipolar_calibration_check.epipolar_error import (EpipolarError,
+                                                         compute_epipolar_error)
+from ..feature_detection.matchers import FeatureMatcher
+from .batch import (add_check_arguments, build_rectifiers, check_options,
+                    collect_frames, load_rig, make_check)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.webm')
+
+Check = Callable[[np.ndarray, np.ndarray], EpipolarError]
+
+# Marks a worker thread that has finished.
+_DONE = object()
+
+
+class _Failure:
+    """
+    Exception of the reader or of setting up a worker, re-raised by run().
+    """
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def read_frames(source: str) -> Iterator[np.ndarray]:
+    """
+    Yield grayscale frames from a video file or stream URL, or from the
+    images in a directory or matching a glob pattern.
+    """
+    if source.lower().endswith(VIDEO_EXTENSIONS) or '://' in source:
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise OSError(f"Cannot open video source {source}")
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                if frame.ndim == 3:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                yield frame
+        finally:
+            capture.release()
+        return
+
+    paths = collect_frames(source)
+    if not paths:
+        raise OSError(f"No frames found at {source}")
+    for path in paths:
+        frame = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if frame is None:
+            raise OSError(f"Cannot read image {path}")
+        yield frame
+
+
+def paired_frames(left_source: str,
+                  right_source: str) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield synchronized (left, right) frames until either source ends.
+    """
+    return zip(read_frames(left_source), read_frames(right_source))
+
+
+class RecalibratingCheck:
+    """
+    Epipolar check of raw pairs rectified with the current extrinsics of an
+    OnlineRecalibrator, feeding the inlier matches of each pair back to it.
+    One instance per worker thread, the recalibrator is shared.
+    """
+
+    def __init__(self, recalibrator: OnlineRecalibrator,
+                 detector: str = 'sift', row_band: float | None = None,
+                 f_method: str = 'lmeds', max_matches: int | None = None):
+        self.recalibrator = recalibrator
+        self.matcher = FeatureMatcher(detector, row_band=row_band)
+        self.f_method = f_method
+        self.max_matches = max_matches
+
+    def __call__(self, img1: np.ndarray, img2: np.ndarray) -> EpipolarError:
+        version, (rectifier1, rectifier2) = self.recalibrator.current()
+        result = compute_epipolar_error(rectifier1(img1), rectifier2(img2),
+                                        matcher=self.matcher,
+                                        method=self.f_method,
+                                        max_matches=self.max_matches,
+                                        keep_inliers=True)
+        if result.inliers is not None:
+            self.recalibrator.add_matches(*result.inliers, version=version)
+        return result
+
+
+class StreamPipeline:
+    """
+    Run a pair check over a stream of frame pairs on worker threads.
+
+    check_factory is called once per worker thread, so each thread owns its
+    feature matcher. At most max_in_flight pairs are decoded but not yet
+    yielded at any time; the reader blocks until results are consumed.
+    """
+
+    def __init__(self, check_factory: Callable[[], Check],
+                 num_workers: int = 2, max_in_flight: int = 8):
+        self.check_factory = check_factory
+        self.num_workers = num_workers
+        self.max_in_flight = max(max_in_flight, num_workers)
+
+    def _read(self, pairs: Iterable[tuple[np.ndarray, np.ndarray]],
+              tasks: queue.Queue, results: queue.Queue,
+              slots: threading.Semaphore, stop: threading.Event) -> None:
+        try:
+            for index, (img1, img2) in enumerate(pairs):
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                tasks.put((index, img1, img2))
+        except Exception as e:
+            results.put(_Failure(e))
+        finally:
+            for _ in range(self.num_workers):
+                tasks.put(None)
+
+    def _work(self, tasks: queue.Queue, results: queue.Queue,
+              stop: threading.Event) -> None:
+        try:
+            check = self.check_factory()
+        except Exception as e:
+            # Reported by run(), keep taking tasks so the reader can finish.
+            results.put(_Failure(e))
+            check = None
+        while True:
+            item = tasks.get()
+            if item is None:
+                results.put(_DONE)
+                return
+            index, img1, img2 = item
+            if stop.is_set() or check is None:
+                continue
+            try:
+                result = check(img1, img2)
+            except Exception as e:
+                result = e
+            results.put((index, result))
+
+    def run(
+        self, pairs: Iterable[tuple[np.ndarray, np.ndarray]]
+    ) -> Iterator[tuple[int, EpipolarError | Exception]]:
+        """
+        Yield (frame index, result) in frame order. A failed check yields
+        the exception instead of a result; a failing reader or check_factory
+        raises.
+        """
+        stop = threading.Event()
+        slots = threading.Semaphore(self.max_in_flight)
+        tasks = queue.Queue(maxsize=self.max_in_flight)
+        # Never more than max_in_flight results, plus the end markers and one
+        # failure per thread.
+        results = queue.Queue(maxsize=self.max_in_flight +
+                              2 * self.num_workers + 1)
+        threads = [threading.Thread(target=self._read,
+                                    args=(pairs, tasks, results, slots, stop),
+                                    daemon=True)]
+        threads += [threading.Thread(target=self._work,
+                                     args=(tasks, results, stop), daemon=True)
+                    for _ in range(self.num_workers)]
+        for thread in threads:
+            thread.start()
+
+        finished = 0
+        next_index = 0
+        ready = {}
+        try:
+            while finished < self.num_workers:
+                item = results.get()
+                if item is _DONE:
+                    finished += 1
+                    continue
+                if isinstance(item, _Failure):
+                    raise item.error
+                index, result = item
+                ready[index] = result
+                while next_index in ready:
+                    yield next_index, ready.pop(next_index)
+                    slots.release()
+                    next_index += 1
+        finally:
+            stop.set()
+            # Workers skip the remaining tasks once stopped, wait for them so
+            # none is left running OpenCV code at interpreter exit.
+            for thread in threads:
+                thread.join()
+
+
+def add_stream_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--left_source', type=str, required=True,
+                        help='Left video file, stream URL, directory or glob '
+                        'pattern of frames')
+    parser.add_argument('--right_source', type=str, required=True,
+                        help='Right video file, stream URL, directory or glob '
+                        'pattern of frames')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Number of worker threads')
+    parser.add_argument('--max_in_flight', type=int, default=8,
+                        help='Maximum number of decoded frame pairs held in '
+                        'memory')
+    parser.add_argument('--recalibrate', action='store_true',
+                        help='Refine R/T from the inlier matches while the '
+                        'stream runs and rectify with the refined extrinsics, '
+                        'requires --rectify')
+    parser.add_argument('--update_every', type=int, default=500,
+                        help='Re-estimate R/T every this many new matches')
+    parser.add_argument('--angle_threshold', type=float, default=0.1,
+                        help='Re-rectify only when R or the baseline direction '
+                        'moved by more than this many degrees')
+    add_check_arguments(parser)
+
+
+def run_stream(args: argparse.Namespace) -> int:
+    """
+    Check a stereo stream and write one JSON record per frame pair.
+    """
+    if not args.no_map_cache:
+        default_map_cache.cache_dir = args.map_cache_dir
+    recalibrator = None
+    if args.recalibrate:
+        if (not args.rectify or args.checker != 'features' or
+                args.coarse_scale is not None):
+            print("Error: --recalibrate needs --rectify and the full "
+                  "resolution features checker.", file=sys.stderr)
+            return 1
+        rig = load_rig(args)
+        recalibrator = OnlineRecalibrator(
+            rig.left, rig.right, rig.R, rig.T,
+            update_every=args.update_every,
+            angle_threshold=args.angle_threshold, strip_rows=args.strip_rows)
+        check_factory = lambda: RecalibratingCheck(
+            recalibrator, args.detector, args.row_band, args.f_method,
+            args.max_matches)
+    else:
+        rectifiers = (build_rectifiers(load_rig(args), args.strip_rows)
+                      if args.rectify else None)
+        options = check_options(args)
+        check_factory = lambda: make_check(rectifiers, **options)
+    pipeline = StreamPipeline(check_factory, args.workers, args.max_in_flight)
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    num_frames = 0
+    num_errors = 0
+    try:
+        for index, result in pipeline.run(
+                paired_frames(args.left_source, args.right_source)):
+            record = {'frame': index}
+            if isinstance(result, Exception):
+                record['error'] = str(result)
+                num_errors += 1
+            else:
+                record.update(result.as_dict())
+            if recalibrator is not None:
+                record['num_updates'] = recalibrator.num_updates
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+            num_frames += 1
+    except Exception as e:
+        # An unreadable source or a check that cannot be set up ends the
+        # whole stream.
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"Checked {num_frames} frame pairs, {num_errors} failed.",
+          file=sys.stderr)
+    if recalibrator is not None:
+        print(f"Refined the extrinsics {recalibrator.num_updates} times, "
+              f"rotation now {rotation_angle(recalibrator.R @ rig.R.T):.3f} "
+              f"deg from the initial one, T = "
+              f"{recalibrator.T.ravel().round(4).tolist()}.", file=sys.stderr)
+    return 0
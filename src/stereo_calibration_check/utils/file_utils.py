@@ -1,9 +1,17 @@
 """
 Utility functions for file operations.
 """
+import hashlib
+
 import yaml
 import numpy as np
 
+from .profiling import timed
+
+# The libyaml loader is several times faster, fall back to the pure Python
+# one when PyYAML was built without it.
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 
 def load_yaml(file_path: str) -> dict:
     """
@@ -11,15 +19,28 @@ def load_yaml(file_path: str) -> dict:
     """
 
     with open(file_path, 'r') as file:
-        data = yaml.safe_load(file)
+        data = yaml.load(file, Loader=YamlLoader)
     return data
 
 
+@timed('load_intrinsics')
 def load_intrinsics(calib_path: str) -> dict:
     """
     Load camera intrinsics from a YAML file.
+
+    The returned dict also holds 'sha256', a hash of the file contents used
+    to key cached remap tables.
+    """
+    with open(calib_path, 'rb') as file:
+        contents = file.read()
+    return parse_intrinsics(contents)
+
+
+def parse_intrinsics(contents: bytes) -> dict:
+    """
+    Parse the contents of a camera intrinsics YAML file.
     """
-    intrinsics = load_yaml(calib_path)
+    intrinsics = yaml.load(contents, Loader=YamlLoader)
     data = dict()
     data['K'] = np.array(intrinsics['camera_matrix']['data']).reshape(3, 3)
     data['D'] = np.array(intrinsics['distortion_coefficients']['data'])
@@ -28,5 +49,6 @@ def load_intrinsics(calib_path: str) -> dict:
     data['P'] = np.array(intrinsics['projection_matrix']['data']).reshape(3, 4)
     data['width'] = intrinsics['image_width']
     data['height'] = intrinsics['image_height']
+    data['sha256'] = hashlib.sha256(contents).hexdigest()
 
     return data
@@ -0,0 +1,208 @@
+"""
+Lightweight per-stage timing instrumentation.
+
+Stages are wrapped with span() or @timed(). Nothing is recorded until
+enable() is called; when disabled, a span costs one flag check. Durations
+are aggregated into fixed-bucket histograms, so memory stays constant for
+long runs, and can be exported as JSON or Prometheus text.
+"""
+from bisect import bisect_left
+from collections.abc import Callable
+from contextlib import nullcontext
+import functools
+import json
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds, 10us to 70s.
+BUCKETS = tuple(m * 10.0**e for e in range(-5, 2)
+                for m in (1, 1.5, 2, 3, 5, 7))
+
+_enabled = False
+_histograms: dict[str, 'Histogram'] = {}
+_lock = threading.Lock()
+_null_span = nullcontext()
+
+
+class Histogram:
+    """
+    Count, sum and bucket counts of the durations of one stage.
+    """
+    __slots__ = ('count', 'total', 'counts')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.counts = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+
+    def merge(self, state: dict) -> None:
+        self.count += state['count']
+        self.total += state['total']
+        self.counts = [a + b for a, b in zip(self.counts, state['counts'])]
+
+    def state(self) -> dict:
+        return {'count': self.count, 'total': self.total,
+                'counts': list(self.counts)}
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by interpolating inside its bucket.
+        """
+        if self.count == 0:
+            return float('nan')
+        target = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= target:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (target - cumulative) / n
+            cumulative += n
+        return BUCKETS[-1]
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        record(self.name, time.perf_counter() - self.start)
+
+
+def enable(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def record(name: str, seconds: float) -> None:
+    """
+    Add one duration of a stage.
+    """
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+def span(name: str):
+    """
+    Context manager timing the enclosed block as stage name.
+    """
+    if not _enabled:
+        return _null_span
+    return _Span(name)
+
+
+def timed(name: str) -> Callable:
+    """
+    Decorator timing every call of the function as stage name.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+
+
+def drain() -> dict:
+    """
+    Return the raw histogram state and reset it, for shipping the metrics of
+    a worker process to the parent.
+    """
+    with _lock:
+        state = {name: h.state() for name, h in _histograms.items()}
+        _histograms.clear()
+    return state
+
+
+def merge(state: dict) -> None:
+    """
+    Add histogram state returned by drain() in another process.
+    """
+    with _lock:
+        for name, histogram_state in state.items():
+            histogram = _histograms.get(name)
+            if histogram is None:
+                histogram = _histograms[name] = Histogram()
+            histogram.merge(histogram_state)
+
+
+def summary() -> dict:
+    """
+    Return count, total, mean and p50/p95/p99 in seconds per stage.
+    """
+    with _lock:
+        return {
+            name: {
+                'count': h.count,
+                'total': h.total,
+                'mean': h.total / h.count if h.count else float('nan'),
+                'p50': h.quantile(0.50),
+                'p95': h.quantile(0.95),
+                'p99': h.quantile(0.99),
+            }
+            for name, h in sorted(_histograms.items())
+        }
+
+
+def to_json() -> str:
+    return json.dumps(summary(), indent=2)
+
+
+def to_prometheus(metric: str = 'stereo_check_stage_seconds') -> str:
+    """
+    Render the histograms in the Prometheus text exposition format.
+    """
+    lines = [f'# HELP {metric} Duration of pipeline stages in seconds.',
+             f'# TYPE {metric} histogram']
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h.counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{bound:g}"}} '
+                             f'{cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {h.total}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {h.count}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path: str) -> None:
+    """
+    Write the metrics to path, as Prometheus text for .prom/.txt files and
+    JSON otherwise.
+    """
+    text = to_prometheus() if path.endswith(('.prom', '.txt')) else to_json()
+    with open(path, 'w') as file:
+        file.write(text)
@@ -1,4 +1,8 @@
-import matplotlib.pyplot as plt
+import os
+import queue
+import re
+import threading
+
 import cv2 as cv
 import numpy as np
 
@@ -10,6 +14,10 @@ def display_images_side_by_side(img1: np.ndarray,
     """
     Display two images side by side for comparison.
     """
+    # matplotlib (and its Qt backend) is only needed for interactive display
+    # and is slow to import, so it is imported on first use.
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(10, 5))
 
     stacked_images = np.hstack((img1, img2))
@@ -26,3 +34,107 @@ def save_images_side_by_side(img1: np.ndarray, img2: np.ndarray,
     """
     combined_image = np.hstack((img1, img2))
     cv.imwrite(output_path, combined_image)
+
+
+def side_by_side(img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
+    """
+    Stack two images horizontally, converting to BGR when only one of them
+    has color.
+    """
+    if img1.ndim != img2.ndim:
+        if img1.ndim == 2:
+            img1 = cv.cvtColor(img1, cv.COLOR_GRAY2BGR)
+        if img2.ndim == 2:
+            img2 = cv.cvtColor(img2, cv.COLOR_GRAY2BGR)
+    return np.hstack((img1, img2))
+
+
+def slugify(title: str) -> str:
+    """
+    Turn a figure title into a file name stem.
+    """
+    return re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_')
+
+
+class ImageWriter:
+    """
+    Writes images on a background thread.
+
+    Images are encoded with cv.imencode and written by one worker thread, so
+    the caller only pays for queueing them. The queue is bounded by
+    max_pending; submit blocks when the writer falls behind instead of
+    holding an unbounded number of frames in memory. Errors of the worker
+    are raised from the next submit or from close.
+    """
+
+    def __init__(self, output_dir: str = '.', image_format: str = 'png',
+                 jpeg_quality: int = 95, png_compression: int = 3,
+                 max_pending: int = 8):
+        if image_format not in ('png', 'jpg'):
+            raise ValueError(f"Unsupported image format '{image_format}'")
+        self.output_dir = output_dir
+        self.image_format = image_format
+        if image_format == 'jpg':
+            self.params = [cv.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        else:
+            self.params = [cv.IMWRITE_PNG_COMPRESSION, png_compression]
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        os.makedirs(output_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'ImageWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, image = item
+            try:
+                ok, data = cv.imencode('.' + self.image_format, image,
+                                       self.params)
+                if not ok:
+                    raise RuntimeError(f"Failed to encode {path}")
+                with open(path, 'wb') as file:
+                    file.write(data)
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, name: str, image: np.ndarray) -> str:
+        """
+        Queue image to be written as name plus the format extension in
+        output_dir and return its path. The image must not be modified
+        afterwards.
+        """
+        self._raise_error()
+        path = os.path.join(self.output_dir, f'{name}.{self.image_format}')
+        self._queue.put((path, image))
+        return path
+
+    def submit_side_by_side(self, img1: np.ndarray, img2: np.ndarray,
+                            title: str) -> str:
+        """
+        Queue the side-by-side composite of a pair, named after title.
+        """
+        return self.submit(slugify(title), side_by_side(img1, img2))
+
+    def close(self) -> None:
+        """
+        Wait until all queued images are written.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
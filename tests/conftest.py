@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from stereo_calibration_check.calibrate.stereo_calibrate import get_projection_matrix
+from stereo_calibration_check.calibrate.undistort import Rectifier
+from stereo_calibration_check.utils.file_utils import load_intrinsics
+
+DATA = Path(__file__).resolve().parents[1] / 'data'
+
+
+@pytest.fixture(scope='session')
+def intrinsics() -> dict:
+    return load_intrinsics(str(DATA / 'calibration' / 'thermal_left.yaml'))
+
+
+@pytest.fixture(scope='session')
+def stereo_intrinsics(intrinsics) -> tuple[dict, dict]:
+    return intrinsics, load_intrinsics(
+        str(DATA / 'calibration' / 'thermal_right.yaml'))
+
+
+@pytest.fixture(scope='session')
+def projections(stereo_intrinsics) -> tuple[np.ndarray, ...]:
+    return get_projection_matrix(*stereo_intrinsics)
+
+
+@pytest.fixture(scope='session')
+def raw_frame() -> np.ndarray:
+    return cv2.imread(str(DATA / 'images' / 'chess_left_distorted.png'),
+                      cv2.IMREAD_GRAYSCALE)
+
+
+@pytest.fixture(scope='session')
+def rectified_frame() -> np.ndarray:
+    return cv2.imread(str(DATA / 'images' / 'thermal_left_rectified.png'),
+                      cv2.IMREAD_GRAYSCALE)
+
+
+@pytest.fixture
+def counting_rectifier() -> type[Rectifier]:
+    """
+    A Rectifier class recording the (size, rows) of every map build in its
+    calls list, fresh for each test.
+    """
+
+    class CountingRectifier(Rectifier):
+        calls = []
+
+        def build_maps(self, size, rows=None):
+            self.calls.append((size, rows))
+            return super().build_maps(size, rows)
+
+    return CountingRectifier
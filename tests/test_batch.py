@@ -0,0 +1,35 @@
+from conftest import DATA
+from stereo_calibration_check.pipeline import batch
+from stereo_calibration_check.pipeline.batch import pair_frames
+
+
+def test_pair_frames_by_name():
+    left = ['a/frame_001_left.png', 'a/frame_002_left.png',
+            'a/frame_003_left.png']
+    right = ['b/frame_003_right.png', 'b/frame_001_right.png']
+    assert pair_frames(left, right) == [
+        ('a/frame_001_left.png', 'b/frame_001_right.png'),
+        ('a/frame_003_left.png', 'b/frame_003_right.png'),
+    ]
+
+
+def test_pair_frames_by_timestamp():
+    left = ['l/cam0_100.000.png', 'l/cam0_100.100.png', 'l/cam0_105.png',
+            'l/no_time.png']
+    right = ['r/cam1_100.098.png', 'r/cam1_100.004.png', 'r/cam1_103.png']
+    assert pair_frames(left, right, max_time_diff=0.01) == [
+        ('l/cam0_100.000.png', 'r/cam1_100.004.png'),
+        ('l/cam0_100.100.png', 'r/cam1_100.098.png'),
+    ]
+    assert pair_frames(left, [], max_time_diff=0.01) == []
+
+
+def test_failing_pair_becomes_error_record(monkeypatch):
+
+    def check(img1, img2):
+        raise ValueError('empty match set')
+
+    monkeypatch.setitem(batch._worker_state, 'check', check)
+    path = str(DATA / 'images' / 'rect_left.png')
+    record = batch._process_pair(path, path)
+    assert record['error'] == 'empty match set'
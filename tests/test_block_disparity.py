@@ -0,0 +1,59 @@
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+from stereo_calibration_check.epipolar_calibration_check.block_disparity import (
+    compute_block_disparity, grid_centers)
+from stereo_calibration_check.pipeline.batch import make_check
+
+
+def shifted(image: np.ndarray, dx: float, dy: float) -> np.ndarray:
+    M = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.warpAffine(image, M, (image.shape[1], image.shape[0]))
+
+
+@pytest.mark.parametrize('dy', [0.0, 1.5, -2.5])
+def test_recovers_a_subpixel_vertical_shift(rectified_frame, dy):
+    result = compute_block_disparity(rectified_frame,
+                                     shifted(rectified_frame, -12, dy))
+    assert result.num_regions == 48
+    assert result.valid_ratio > 0.6
+    assert np.nanmedian(result.dy) == pytest.approx(dy, abs=0.02)
+    assert result.median_dy == pytest.approx(abs(dy), abs=0.02)
+
+
+def test_region_map_locates_the_misalignment(rectified_frame):
+    right = shifted(rectified_frame, -12, 1)
+    right[:, 320:] = shifted(rectified_frame, -12, 3)[:, 320:]
+    result = compute_block_disparity(rectified_frame, right)
+    valid = ~np.isnan(result.dy)
+    left_half = result.centers[..., 0] < 320
+    np.testing.assert_allclose(result.dy[valid & left_half], 1, atol=0.1)
+    np.testing.assert_allclose(result.dy[valid & ~left_half], 3, atol=0.1)
+
+
+def test_textureless_regions_are_left_out():
+    blank = np.full((512, 640), 128, dtype=np.uint8)
+    result = compute_block_disparity(blank, blank)
+    assert result.num_valid == 0
+    assert np.isnan(result.dy).all() and math.isnan(result.median_dy)
+    record = result.as_dict()
+    assert record['median_dy'] is None
+    assert record['dy'][0][0] is None
+    assert 'score' not in record and 'centers' not in record
+
+
+def test_grid_covers_the_image_inside_the_margin():
+    xs, ys = grid_centers(640, 512, (8, 6), 100)
+    assert len(xs) == 8 and len(ys) == 6
+    assert (np.diff(xs) > 0).all() and (np.diff(ys) > 0).all()
+    assert xs[0] - 100 == pytest.approx(540 - xs[-1], abs=1)
+    assert ys[0] - 100 == pytest.approx(412 - ys[-1], abs=1)
+
+
+def test_block_checker(rectified_frame):
+    check = make_check(None, checker='block')
+    result = check(rectified_frame, shifted(rectified_frame, -12, 1.5))
+    assert result.median_dy == pytest.approx(1.5, abs=0.02)
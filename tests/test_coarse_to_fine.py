@@ -0,0 +1,71 @@
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+from stereo_calibration_check.calibrate.map_cache import MapCache
+from stereo_calibration_check.calibrate.undistort import Rectifier
+from stereo_calibration_check.epipolar_calibration_check.coarse_to_fine import (
+    CoarseToFineCheck, downscale)
+from stereo_calibration_check.epipolar_calibration_check.epipolar_error import \
+    EpipolarError
+
+
+def result(median_dy: float, num_inliers: int = 100) -> EpipolarError:
+    return EpipolarError(num_inliers, num_inliers, median_dy, median_dy,
+                         median_dy, 0.1, 0.2)
+
+
+def shifted(image: np.ndarray, dx: float, dy: float) -> np.ndarray:
+    M = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.warpAffine(image, M, (image.shape[1], image.shape[0]))
+
+
+def test_escalates_only_near_the_threshold():
+    check = CoarseToFineCheck(threshold=1.0, scale=0.5)
+    # A quarter of a coarse pixel is half a full-resolution pixel.
+    assert check.escalate_margin == 0.5
+    assert not check.needs_full_resolution(result(0.4))
+    assert check.needs_full_resolution(result(0.6))
+    assert check.needs_full_resolution(result(1.5))
+    assert not check.needs_full_resolution(result(1.6))
+    assert check.needs_full_resolution(result(0.1, num_inliers=10))
+    assert check.needs_full_resolution(result(math.nan))
+
+
+def test_clear_pairs_stay_coarse(rectified_frame):
+    check = CoarseToFineCheck(threshold=1.0, scale=0.5)
+    aligned = check(rectified_frame, shifted(rectified_frame, -12, 0))
+    assert aligned.scale == 0.5
+    assert aligned.median_dy < 0.2
+    misaligned = check(rectified_frame, shifted(rectified_frame, -12, 3))
+    assert misaligned.scale == 0.5
+    assert misaligned.median_dy == pytest.approx(3, abs=0.3)
+
+
+def test_borderline_pair_is_checked_at_full_resolution(rectified_frame):
+    check = CoarseToFineCheck(threshold=1.0, scale=0.5)
+    borderline = check(rectified_frame, shifted(rectified_frame, -12, 1))
+    assert borderline.scale == 1.0
+    assert borderline.median_dy == pytest.approx(1, abs=0.1)
+
+
+def test_downscale_sizes(rectified_frame):
+    h, w = rectified_frame.shape
+    assert downscale(rectified_frame, 0.5).shape == (h // 2, w // 2)
+    assert downscale(rectified_frame, 0.25).shape == (h // 4, w // 4)
+    assert downscale(rectified_frame, 0.75).shape == (round(h * 0.75),
+                                                      round(w * 0.75))
+
+
+def test_raw_frames_are_rectified_to_the_coarse_size(intrinsics, projections,
+                                                     raw_frame):
+    R1, _, P1, _ = projections
+    rectifier = Rectifier(intrinsics, R1, P1, cache=MapCache())
+    check = CoarseToFineCheck(scale=0.5, rectifiers=(rectifier, rectifier))
+    coarse = check.coarse_rectifiers[0](raw_frame)
+    expected = downscale(rectifier(raw_frame), 0.5)
+    assert coarse.shape == expected.shape
+    # Same geometry, only the filtering of the two paths differs.
+    assert cv2.absdiff(coarse, expected).mean() < 3
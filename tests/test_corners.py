@@ -0,0 +1,30 @@
+import numpy as np
+
+from stereo_calibration_check.feature_detection.corners import (
+    ChessboardDetector, corner_detection)
+
+
+def test_region_reuse_finds_the_same_corners(raw_frame):
+    with ChessboardDetector(concurrent=False) as detector:
+        first = detector.find(raw_frame)
+        assert detector._rois[0] is not None
+        # Found again through the board region of the first call.
+        second = detector.find(raw_frame)
+    assert first is not None and second is not None
+    np.testing.assert_allclose(second, first, atol=0.01)
+
+
+def test_downscaled_search_matches_full_resolution(raw_frame):
+    full = ChessboardDetector(prescale=None, concurrent=False).find(raw_frame)
+    downscaled = ChessboardDetector(concurrent=False).find(raw_frame)
+    np.testing.assert_allclose(downscaled, full, atol=0.01)
+
+
+def test_corner_detection_pair(raw_frame):
+    with ChessboardDetector() as detector:
+        result = detector.detect(raw_frame, raw_frame)
+    pts1, pts2 = corner_detection(raw_frame, raw_frame)
+    assert result.found
+    assert len(pts1) == 48
+    np.testing.assert_allclose(result.pts1, pts1, atol=0.01)
+    np.testing.assert_allclose(result.pts2, pts2, atol=0.01)
@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+
+from stereo_calibration_check.calibrate.distort import build_distort_maps
+
+
+def legacy_distort_maps(intrinsics: dict, P_new: np.ndarray,
+                        size: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    # The maps of the original distort_image: un-project, rotate and
+    # project as three separate steps over the whole frame.
+    w, h = size
+    grid_x, grid_y = np.meshgrid(np.arange(w), np.arange(h))
+    points = np.stack([grid_x, grid_y], axis=-1).reshape(-1, 1, 2)
+    normalized = cv2.fisheye.undistortPoints(points.astype(np.float32),
+                                             intrinsics['K'], intrinsics['D'])
+    rays = np.concatenate([normalized.reshape(-1, 2), np.ones((h * w, 1))],
+                          axis=1)
+    pixels = (P_new[:3, :3] @ (intrinsics['R'] @ rays.T)).T
+    map_x = (pixels[:, 0] / pixels[:, 2]).reshape(h, w).astype(np.float32)
+    map_y = (pixels[:, 1] / pixels[:, 2]).reshape(h, w).astype(np.float32)
+    return map_x, map_y
+
+
+def test_fused_maps_match_legacy(intrinsics):
+    size = (intrinsics['width'], intrinsics['height'])
+    map_x, map_y = build_distort_maps(intrinsics, intrinsics['P'], size,
+                                      m1type=cv2.CV_32FC1, tile_rows=50)
+    legacy_x, legacy_y = legacy_distort_maps(intrinsics, intrinsics['P'],
+                                             size)
+    assert np.abs(map_x - legacy_x).max() <= 1e-4
+    assert np.abs(map_y - legacy_y).max() <= 1e-4
+
+
+def test_fixed_point_maps_match_float_maps(intrinsics):
+    size = (intrinsics['width'], intrinsics['height'])
+    map_x, map_y = build_distort_maps(intrinsics, intrinsics['P'], size,
+                                      m1type=cv2.CV_32FC1)
+    map1, map2 = build_distort_maps(intrinsics, intrinsics['P'], size)
+    fixed_x, fixed_y = cv2.convertMaps(map1, map2, cv2.CV_32FC1)
+    # Fixed-point maps hold 1/32 pixel steps.
+    assert np.abs(fixed_x - map_x).max() <= 1 / 32
+    assert np.abs(fixed_y - map_y).max() <= 1 / 32
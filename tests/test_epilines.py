@@ -0,0 +1,58 @@
+import numpy as np
+
+from stereo_calibration_check.epipolar_calibration_check.epipolar_line import (
+    EPILINE_PALETTE, draw_epilines_on, render_epilines)
+from stereo_calibration_check.epipolar_calibration_check.fundamental import \
+    RECTIFIED_F
+
+
+def horizontal_lines(rows: np.ndarray) -> np.ndarray:
+    # a x + b y + c = 0 with a = 0, b = 1: the line y = row.
+    return np.column_stack([np.zeros(len(rows)), np.ones(len(rows)), -rows])
+
+
+def test_lines_and_points_in_palette_colors():
+    img = np.zeros((120, 200), dtype=np.uint8)
+    rows = np.arange(10, 110, 20, dtype=np.float64)
+    pts = np.column_stack([np.linspace(20, 180, len(rows)), rows])
+    out = draw_epilines_on(img, horizontal_lines(rows), pts)
+
+    assert out.shape == (120, 200, 3)
+    assert not img.any()
+    for i, (x, y) in enumerate(pts.astype(int)):
+        color = EPILINE_PALETTE[i]
+        # The whole row is drawn in the color of its match.
+        assert (out[y] == color).all()
+        # A filled disc of radius 5 around the point, and nothing beyond.
+        assert (out[y - 5:y + 6, x] == color).all()
+        assert (out[y - 3:y + 4, x - 3:x + 4] == color).all()
+        assert not out[y + 6, x].any() and not out[y - 6, x].any()
+    drawn = out.any(axis=2)
+    assert drawn.sum() == len(rows) * (200 + 81 - 11)
+
+
+def test_points_outside_the_image_are_clipped():
+    img = np.zeros((50, 50), dtype=np.uint8)
+    pts = np.array([[-2.0, 25.0], [49.0, 0.0], [200.0, 200.0]])
+    out = draw_epilines_on(img, horizontal_lines(pts[:, 1]), pts)
+    assert (out[25, 0] == EPILINE_PALETTE[0]).all()
+    assert (out[3, 47] == EPILINE_PALETTE[1]).all()
+
+
+def test_max_lines_subsamples_evenly():
+    img = np.zeros((100, 50), dtype=np.uint8)
+    rows = np.arange(5, 95, 10, dtype=np.float64)
+    pts = np.column_stack([np.full(len(rows), -20.0), rows])
+    out = draw_epilines_on(img, horizontal_lines(rows), pts, max_lines=3)
+    drawn_rows = np.flatnonzero(out.any(axis=(1, 2)))
+    np.testing.assert_array_equal(drawn_rows, rows[[0, 4, 8]].astype(int))
+
+
+def test_rectified_epilines_follow_the_rows_of_the_other_image():
+    img = np.zeros((100, 160), dtype=np.uint8)
+    pts1 = np.array([[40.0, 20.0], [80.0, 50.0], [120.0, 80.0]])
+    pts2 = pts1 - [10.0, 0.0]
+    out1, out2 = render_epilines(img, img, RECTIFIED_F, pts1, pts2)
+    for i, y in enumerate(pts1[:, 1].astype(int)):
+        assert (out1[y] == EPILINE_PALETTE[i]).all()
+        assert (out2[y] == EPILINE_PALETTE[i]).all()
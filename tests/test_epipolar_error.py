@@ -0,0 +1,68 @@
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+from stereo_calibration_check.epipolar_calibration_check.epipolar_error import (
+    compute_epipolar_error, sampson_distance)
+from stereo_calibration_check.epipolar_calibration_check.fundamental import \
+    RECTIFIED_F
+
+
+def shifted(image: np.ndarray, dx: float, dy: float) -> np.ndarray:
+    M = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.warpAffine(image, M, (image.shape[1], image.shape[0]))
+
+
+def test_horizontal_shift_has_no_vertical_error(rectified_frame):
+    result = compute_epipolar_error(rectified_frame,
+                                    shifted(rectified_frame, -12, 0))
+    assert result.num_inliers > 50
+    assert result.median_dy < 0.1
+    assert result.mean_sampson < 0.1
+
+
+def test_vertical_shift_is_measured(rectified_frame):
+    result = compute_epipolar_error(rectified_frame,
+                                    shifted(rectified_frame, -12, 2))
+    assert result.median_dy == pytest.approx(2, abs=0.1)
+
+
+def test_downscaled_pair_reports_full_resolution_pixels(rectified_frame):
+    right = shifted(rectified_frame, -12, 2)
+    small = [cv2.resize(img, None, fx=0.5, fy=0.5,
+                        interpolation=cv2.INTER_AREA)
+             for img in (rectified_frame, right)]
+    coarse = compute_epipolar_error(*small, margin=50, scale=0.5)
+    result = coarse.to_full_resolution(0.5)
+    assert coarse.median_dy == pytest.approx(1, abs=0.1)
+    assert result.median_dy == pytest.approx(2, abs=0.2)
+    assert result.scale == 0.5
+
+
+def test_no_matches_give_nan_statistics():
+    blank = np.zeros((240, 320), dtype=np.uint8)
+    result = compute_epipolar_error(blank, blank, draw=True)
+    assert result.num_inliers == 0
+    assert math.isnan(result.median_dy)
+    record = result.as_dict()
+    assert record['median_dy'] is None
+    assert 'epilines' not in record and 'inliers' not in record
+
+
+def test_as_dict_leaves_out_the_overlays(rectified_frame):
+    result = compute_epipolar_error(rectified_frame,
+                                    shifted(rectified_frame, -12, 0),
+                                    draw=True)
+    assert result.epilines[0].shape == rectified_frame.shape + (3,)
+    assert set(result.as_dict()) == {
+        'num_matches', 'num_inliers', 'mean_dy', 'median_dy', 'p95_dy',
+        'mean_sampson', 'p95_sampson', 'scale'}
+
+
+def test_sampson_distance_of_a_vertical_offset():
+    pts1 = np.array([[10.0, 20.0], [50.0, 60.0]])
+    pts2 = pts1 + [[-5.0, 1.0], [3.0, -4.0]]
+    np.testing.assert_allclose(sampson_distance(RECTIFIED_F, pts1, pts2),
+                               [1 / math.sqrt(2), 4 / math.sqrt(2)])
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from stereo_calibration_check.epipolar_calibration_check import epipolar_error
+from stereo_calibration_check.epipolar_calibration_check.epipolar_line import fit_fundamental
+from stereo_calibration_check.epipolar_calibration_check.fundamental import (
+    RECTIFIED_F, estimate_fundamental)
+
+
+def rectified_matches(n: int = 200, dy: float = 0.0, noise: float = 0.2,
+                      seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    # Matches of a rectified 640x512 pair at varying depth, with the right
+    # image shifted down by dy.
+    rng = np.random.default_rng(seed)
+    pts1 = rng.uniform([120, 120], [520, 400], (n, 2))
+    pts2 = pts1 - np.column_stack([rng.uniform(5, 60, n), np.zeros(n)])
+    pts2[:, 1] += dy + rng.normal(0, noise, n)
+    return np.float32(pts1), np.float32(pts2)
+
+
+def test_auto_accepts_rectified_geometry():
+    pts1, pts2 = rectified_matches()
+    F, mask = estimate_fundamental(pts1, pts2, 'auto')
+    np.testing.assert_array_equal(F, RECTIFIED_F)
+    assert mask.all()
+
+
+def test_auto_falls_back_on_misaligned_pair():
+    pts1, pts2 = rectified_matches(dy=4.0)
+    F, mask = estimate_fundamental(pts1, pts2, 'auto')
+    assert F is not None
+    assert not np.allclose(F / np.abs(F).max(), RECTIFIED_F)
+    assert mask.sum() >= 8
+
+
+def test_auto_needs_enough_matches():
+    pts1, pts2 = rectified_matches(n=5)
+    F, mask = estimate_fundamental(pts1, pts2, 'auto')
+    assert F is None
+    assert not mask.any()
+
+
+def test_unknown_method():
+    pts1, pts2 = rectified_matches()
+    with pytest.raises(ValueError):
+        estimate_fundamental(pts1, pts2, 'eight_point')
+
+
+def test_thresholds_scale_with_resolution():
+    # 0.8 px of misalignment at half resolution is 1.6 px at full
+    # resolution, beyond the 1 px acceptance threshold.
+    pts1, pts2 = rectified_matches(dy=0.8, noise=0.05)
+    F, _, _ = fit_fundamental(pts1, pts2, 'auto')
+    np.testing.assert_array_equal(F, RECTIFIED_F)
+    F, _, _ = fit_fundamental(pts1, pts2, 'auto', scale=0.5)
+    assert not np.array_equal(F, RECTIFIED_F)
+
+
+def test_dy_statistics_include_rejected_matches(monkeypatch):
+    pts1, pts2 = rectified_matches(n=100)
+    # A fifth of the matches is 6 px off, outside the auto inlier band.
+    pts2[:20, 1] += 6
+    monkeypatch.setattr(epipolar_error, 'sift_feature_detection',
+                        lambda img1, img2, matcher=None: (pts1, pts2))
+    image = np.zeros((512, 640), dtype=np.uint8)
+    result = epipolar_error.compute_epipolar_error(image, image,
+                                                   method='auto')
+    assert result.num_inliers <= 80
+    assert result.p95_dy > 5
+    assert result.mean_dy > 1
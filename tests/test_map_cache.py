@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+import pytest
+
+from stereo_calibration_check.calibrate.map_cache import MapCache
+from stereo_calibration_check.calibrate.undistort import Rectifier
+
+
+def test_rectifier_matches_fisheye_remap(intrinsics, projections, raw_frame):
+    R1, _, P1, _ = projections
+    h, w = raw_frame.shape
+    map1, map2 = cv2.fisheye.initUndistortRectifyMap(
+        intrinsics['K'], intrinsics['D'], R1, P1, (w, h), cv2.CV_16SC2)
+    expected = cv2.remap(raw_frame, map1, map2, cv2.INTER_LINEAR,
+                         borderMode=cv2.BORDER_CONSTANT)
+
+    rectifier = Rectifier(intrinsics, R1, P1, cache=MapCache())
+    np.testing.assert_array_equal(rectifier(raw_frame), expected)
+
+
+def test_maps_are_built_once(intrinsics, projections, raw_frame,
+                             counting_rectifier):
+    R1, _, P1, _ = projections
+    cache = MapCache()
+    rectifier = counting_rectifier(intrinsics, R1, P1, cache=cache)
+    rectifier(raw_frame)
+    rectifier(raw_frame)
+    # A second remapper of the same calibration shares the cached maps.
+    counting_rectifier(intrinsics, R1, P1, cache=cache)(raw_frame)
+    assert len(counting_rectifier.calls) == 1
+    assert len(cache) == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = MapCache(maxsize=2)
+    maps = (np.zeros(1), np.zeros(1))
+    for key in 'abc':
+        cache.get_or_build(key, lambda: maps)
+    assert 'a' not in cache
+    assert 'b' in cache and 'c' in cache
+
+
+def test_digest_covers_edited_calibration(intrinsics, projections):
+    R1, _, P1, _ = projections
+    edited = dict(intrinsics, K=intrinsics['K'] * 1.1,
+                  D=np.zeros_like(intrinsics['D']))
+    assert (Rectifier(intrinsics, R1, P1)._digest !=
+            Rectifier(edited, R1, P1)._digest)
+    assert (Rectifier(intrinsics, R1, P1)._digest ==
+            Rectifier(dict(intrinsics), R1, P1)._digest)
+
+
+def test_disk_cache_round_trip(intrinsics, projections, raw_frame, tmp_path):
+    R1, _, P1, _ = projections
+    expected = Rectifier(intrinsics, R1, P1,
+                         cache=MapCache(cache_dir=str(tmp_path)))(raw_frame)
+    assert len(list(tmp_path.glob('*.npy'))) == 2
+
+    # A fresh cache, as in a new process, loads the persisted maps.
+    rectifier = Rectifier(intrinsics, R1, P1,
+                          cache=MapCache(cache_dir=str(tmp_path)))
+
+    def rebuild(size, rows=None):
+        raise AssertionError('persisted maps were rebuilt')
+
+    rectifier.build_maps = rebuild
+    map1, _ = rectifier.maps(raw_frame.shape[::-1])
+    assert isinstance(map1, np.memmap)
+    np.testing.assert_array_equal(rectifier(raw_frame), expected)
+
+
+def test_unwritable_cache_dir_falls_back_to_memory(intrinsics, projections,
+                                                   raw_frame, tmp_path):
+    R1, _, P1, _ = projections
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    cache = MapCache(cache_dir=str(blocker / 'maps'))
+    with pytest.warns(RuntimeWarning, match='in memory only'):
+        Rectifier(intrinsics, R1, P1, cache=cache)(raw_frame)
+    assert cache.cache_dir is None
+    assert len(cache) == 1
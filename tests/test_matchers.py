@@ -0,0 +1,62 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from stereo_calibration_check.feature_detection.matchers import (DETECTORS,
+                                                                 FeatureMatcher)
+from stereo_calibration_check.feature_detection.sift import (
+    get_default_matcher, sift_feature_detection)
+
+
+@pytest.fixture(scope='module')
+def shifted_pair(rectified_frame) -> tuple[np.ndarray, np.ndarray]:
+    M = np.float32([[1, 0, -12], [0, 1, 0]])
+    h, w = rectified_frame.shape
+    return rectified_frame, cv2.warpAffine(rectified_frame, M, (w, h))
+
+
+@pytest.mark.parametrize('detector', DETECTORS)
+def test_matches_follow_the_shift(shifted_pair, detector):
+    pts1, pts2 = FeatureMatcher(detector).match(*shifted_pair)
+    assert len(pts1) > 20
+    assert pts1.dtype == pts2.dtype == np.float32
+    offsets = pts2 - pts1
+    assert np.median(np.abs(offsets[:, 0] + 12)) < 0.5
+    assert np.median(np.abs(offsets[:, 1])) < 0.5
+
+
+def test_row_band_keeps_matches_within_the_band(shifted_pair):
+    global_pts1, _ = FeatureMatcher('sift').match(*shifted_pair)
+    pts1, pts2 = FeatureMatcher('sift', row_band=2).match(*shifted_pair)
+    assert np.abs(pts1[:, 1] - pts2[:, 1]).max() <= 2
+    # The band rejects far fewer correct matches than it rules out.
+    assert len(pts1) >= 0.9 * len(global_pts1)
+
+
+def test_images_without_features_give_no_matches():
+    blank = np.zeros((120, 160), dtype=np.uint8)
+    for row_band in (None, 2):
+        pts1, pts2 = FeatureMatcher('sift', row_band=row_band).match(blank,
+                                                                      blank)
+        assert pts1.shape == pts2.shape == (0, 2)
+
+
+def test_unknown_detector():
+    with pytest.raises(ValueError):
+        FeatureMatcher('surf')
+
+
+def test_default_matcher_is_one_per_thread(shifted_pair):
+    assert get_default_matcher() is get_default_matcher()
+    matchers = []
+    thread = threading.Thread(
+        target=lambda: matchers.append(get_default_matcher()))
+    thread.start()
+    thread.join()
+    assert matchers[0] is not get_default_matcher()
+
+    pts1, _ = sift_feature_detection(*shifted_pair)
+    expected1, _ = FeatureMatcher('sift').match(*shifted_pair)
+    assert len(pts1) == pytest.approx(len(expected1), rel=0.05)
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+
+from stereo_calibration_check.calibrate.map_cache import MapCache
+from stereo_calibration_check.calibrate.online import (OnlineRecalibrator,
+                                                       rotation_angle)
+from stereo_calibration_check.calibrate.stereo_calibrate import (DEFAULT_R,
+                                                                 DEFAULT_T)
+
+
+def rectified_pixels(points: np.ndarray, R_rect: np.ndarray,
+                     P_rect: np.ndarray) -> np.ndarray:
+    pixels = points @ (P_rect[:3, :3] @ R_rect).T
+    return pixels[:, :2] / pixels[:, 2:]
+
+
+def test_far_points_correct_a_rotation_drift(stereo_intrinsics):
+    intrinsics1, intrinsics2 = stereo_intrinsics
+    # The rig rotated by 1.1 degrees about the vertical axis since it was
+    # calibrated.
+    R_true = cv2.Rodrigues(np.array([0.0, np.radians(1.1), 0.0]))[0]
+    recalibrator = OnlineRecalibrator(intrinsics1, intrinsics2,
+                                      update_every=400, cache=MapCache())
+
+    # Distant points in front of the left camera, with almost no parallax
+    # over the 0.12 m baseline.
+    rng = np.random.default_rng(0)
+    n = 400
+    depth = rng.uniform(5, 60, n)
+    points1 = np.column_stack([rng.uniform(-0.5, 0.5, (n, 2)) * depth[:, None],
+                               depth])
+    points2 = points1 @ R_true.T + DEFAULT_T.ravel()
+    pts1 = rectified_pixels(points1, recalibrator.R1, recalibrator.P1)
+    pts2 = rectified_pixels(points2, recalibrator.R2, recalibrator.P2)
+
+    assert recalibrator.add_matches(pts1, pts2, version=0)
+    assert recalibrator.num_updates == 1
+    assert rotation_angle(recalibrator.R @ R_true.T) < 0.05
+    assert rotation_angle(recalibrator.R @ DEFAULT_R.T) > 1
+
+
+def test_no_update_without_drift(stereo_intrinsics):
+    intrinsics1, intrinsics2 = stereo_intrinsics
+    recalibrator = OnlineRecalibrator(intrinsics1, intrinsics2,
+                                      update_every=400, cache=MapCache())
+    rng = np.random.default_rng(1)
+    n = 400
+    depth = rng.uniform(2, 30, n)
+    points1 = np.column_stack([rng.uniform(-0.5, 0.5, (n, 2)) * depth[:, None],
+                               depth])
+    points2 = points1 + DEFAULT_T.ravel()
+    pts1 = rectified_pixels(points1, recalibrator.R1, recalibrator.P1)
+    pts2 = rectified_pixels(points2, recalibrator.R2, recalibrator.P2)
+
+    assert not recalibrator.add_matches(pts1, pts2)
+    assert recalibrator.num_updates == 0
+    # The next update waits for update_every new matches.
+    assert not recalibrator.add_matches(pts1[:10], pts2[:10])
@@ -0,0 +1,81 @@
+import json
+import shutil
+import sys
+
+import pytest
+
+from conftest import DATA
+from stereo_calibration_check.calibrate.map_cache import default_map_cache
+from stereo_calibration_check.main import main
+from stereo_calibration_check.utils import profiling
+
+NUM_PAIRS = 4
+
+
+@pytest.fixture
+def metrics():
+    # Start from a cold process state, as the CLI does.
+    cache_dir = default_map_cache.cache_dir
+    default_map_cache.clear()
+    profiling.reset()
+    yield
+    profiling.enable(False)
+    profiling.reset()
+    default_map_cache.clear()
+    default_map_cache.cache_dir = cache_dir
+
+
+def run_cli(monkeypatch, tmp_path, *argv: str) -> dict:
+    metrics_out = tmp_path / 'metrics.json'
+    monkeypatch.setattr(sys, 'argv', [
+        'stereo-calibration-check', '--metrics_out', str(metrics_out),
+        '--map_cache_dir', str(tmp_path / 'maps'), *argv,
+        '--output', str(tmp_path / 'records.jsonl')])
+    assert main() == 0
+    return json.loads(metrics_out.read_text())
+
+
+def copy_frames(directory, names: dict[str, str]) -> None:
+    directory.mkdir()
+    for i in range(NUM_PAIRS):
+        for image, name in names.items():
+            shutil.copy(DATA / 'images' / image,
+                        directory / name.format(i=i))
+
+
+def test_batch_workers_report_only_their_own_stages(metrics, monkeypatch,
+                                                        tmp_path):
+    copy_frames(tmp_path / 'left', {'chess_left_distorted.png':
+                                    'frame_{i}_left.png'})
+    copy_frames(tmp_path / 'right', {'chess_right_distorted.png':
+                                     'frame_{i}_right.png'})
+    summary = run_cli(monkeypatch, tmp_path, 'batch', '--rectify',
+                      '--workers', '3',
+                      '--left_calib', str(DATA / 'calibration' /
+                                          'thermal_left.yaml'),
+                      '--right_calib', str(DATA / 'calibration' /
+                                           'thermal_right.yaml'),
+                      '--left_frames', str(tmp_path / 'left'),
+                      '--right_frames', str(tmp_path / 'right'))
+    # Only the parent builds the maps, the workers memory-map them.
+    assert summary['rectify_maps']['count'] == 2
+    assert summary['detect']['count'] == 2 * NUM_PAIRS
+
+
+def test_rig_workers_report_only_their_own_stages(metrics, monkeypatch,
+                                                  tmp_path):
+    rig_file = tmp_path / 'rig.yaml'
+    rig_file.write_text(
+        f"cameras:\n"
+        f"  cam0: {DATA / 'calibration' / 'thermal_left.yaml'}\n"
+        f"  cam1: {DATA / 'calibration' / 'thermal_right.yaml'}\n")
+    copy_frames(tmp_path / 'cam0', {'chess_left_distorted.png':
+                                    'capture_{i}_cam0.png'})
+    copy_frames(tmp_path / 'cam1', {'chess_right_distorted.png':
+                                    'capture_{i}_cam1.png'})
+    summary = run_cli(monkeypatch, tmp_path, 'rig', '--rectify',
+                      '--workers', '3', '--rig_file', str(rig_file),
+                      '--camera_frames', f"cam0={tmp_path / 'cam0'}",
+                      f"cam1={tmp_path / 'cam1'}")
+    assert summary['rectify_maps']['count'] == 2
+    assert summary['detect']['count'] == 2 * NUM_PAIRS
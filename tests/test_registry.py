@@ -0,0 +1,80 @@
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import DATA
+from stereo_calibration_check.calibrate.registry import (CalibrationRegistry,
+                                                         RigCalibration)
+from stereo_calibration_check.calibrate.stereo_calibrate import \
+    get_projection_matrix
+
+
+def add_rig(directory, name: str) -> None:
+    for side in ('left', 'right'):
+        shutil.copy(DATA / 'calibration' / f'thermal_{side}.yaml',
+                    directory / f'{name}_{side}.yaml')
+
+
+def bump_mtime(path) -> None:
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_rigs_are_parsed_once_and_reloaded_when_edited(tmp_path):
+    add_rig(tmp_path, 'front')
+    registry = CalibrationRegistry(str(tmp_path))
+    assert registry.names() == ['front'] and 'front' in registry
+    rig = registry.get('front')
+    assert registry['front'] is rig
+    bump_mtime(tmp_path / 'front_right.yaml')
+    assert rig.is_stale()
+    reloaded = registry.get('front')
+    assert reloaded is not rig and not reloaded.is_stale()
+
+
+def test_refresh_finds_added_and_removed_rigs(tmp_path):
+    add_rig(tmp_path, 'front')
+    registry = CalibrationRegistry(str(tmp_path))
+    add_rig(tmp_path, 'rear')
+    # A rig without its right camera is not listed.
+    shutil.copy(DATA / 'calibration' / 'thermal_left.yaml',
+                tmp_path / 'side_left.yaml')
+    assert registry.names() == ['front']
+    registry.refresh()
+    assert registry.names() == ['front', 'rear']
+    os.remove(tmp_path / 'front_left.yaml')
+    registry.refresh()
+    assert registry.names() == ['rear']
+    with pytest.raises(KeyError):
+        registry.get('front')
+
+
+def test_extrinsics_file(tmp_path):
+    add_rig(tmp_path, 'front')
+    (tmp_path / 'front_extrinsics.yaml').write_text(
+        'R:\n  rows: 3\n  cols: 3\n  data: [1, 0, 0, 0, 1, 0, 0, 0, 1]\n'
+        'T:\n  rows: 3\n  cols: 1\n  data: [0.3, 0, 0]\n')
+    rig = CalibrationRegistry(str(tmp_path)).get('front')
+    np.testing.assert_array_equal(rig.T.ravel(), [0.3, 0, 0])
+    *_, P2 = get_projection_matrix(rig.left, rig.right, rig.R, rig.T)
+    np.testing.assert_array_equal(rig.P2, P2)
+    assert str(tmp_path / 'front_extrinsics.yaml') in rig.sources()
+
+
+def test_records_stay_read_only_in_workers(stereo_intrinsics):
+    rig = RigCalibration.from_files(
+        str(DATA / 'calibration' / 'thermal_left.yaml'),
+        str(DATA / 'calibration' / 'thermal_right.yaml'))
+    copy = pickle.loads(pickle.dumps(rig))
+    for record in (rig, copy):
+        with pytest.raises(ValueError):
+            record.P1[0, 0] = 0
+        with pytest.raises(ValueError):
+            record.left.K[0, 0] = 0
+    intrinsics, _ = stereo_intrinsics
+    np.testing.assert_array_equal(copy.left['K'], intrinsics['K'])
+    assert copy.left['sha256'] == intrinsics['sha256']
+    assert 'D' in copy.left and 'extra' not in copy.left
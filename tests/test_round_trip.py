@@ -0,0 +1,65 @@
+import json
+
+import cv2
+import numpy as np
+
+from stereo_calibration_check.calibrate.distort import build_distort_maps
+from stereo_calibration_check.calibrate.map_cache import MapCache
+from stereo_calibration_check.calibrate.round_trip import (INVALID,
+                                                           RoundTripCheck,
+                                                           json_record)
+
+
+def test_composed_maps_are_near_identity(intrinsics, rectified_frame):
+    h, w = rectified_frame.shape
+    check = RoundTripCheck(intrinsics, cache=MapCache())
+    map_x, map_y = check.maps((w, h))
+    valid = map_x != INVALID
+    assert valid.mean() > 0.99
+    np.testing.assert_array_equal(map_y == INVALID, ~valid)
+
+    u, v = np.meshgrid(np.arange(w), np.arange(h))
+    assert np.abs(map_x - u)[valid].max() < 0.1
+    assert np.abs(map_y - v)[valid].max() < 0.1
+
+    _, mean_shift, max_shift, valid_ratio = check.geometry((w, h))
+    assert mean_shift < max_shift < 0.1
+    assert valid_ratio == valid.mean()
+
+
+def test_single_remap_matches_sequential_round_trip(intrinsics,
+                                                    rectified_frame):
+    h, w = rectified_frame.shape
+    K, D, R, P = (np.asarray(intrinsics[name], dtype=np.float64)
+                  for name in ('K', 'D', 'R', 'P'))
+    rect_x, rect_y = cv2.fisheye.initUndistortRectifyMap(K, D, R, P, (w, h),
+                                                         cv2.CV_32FC1)
+    dist_x, dist_y = build_distort_maps(intrinsics, P, (w, h),
+                                        m1type=cv2.CV_32FC1)
+    distorted = cv2.remap(rectified_frame, dist_x, dist_y, cv2.INTER_LINEAR)
+    sequential = cv2.remap(distorted, rect_x, rect_y, cv2.INTER_LINEAR)
+
+    check = RoundTripCheck(intrinsics, cache=MapCache())
+    composed = check(rectified_frame)
+    mask = check.geometry((w, h))[0].astype(bool)
+    # The sequential round trip interpolates twice and blurs edges more.
+    error = cv2.absdiff(composed, sequential)[mask]
+    assert error.mean() < 1
+    assert np.percentile(error, 99) <= 8
+
+
+def test_check_statistics(intrinsics, rectified_frame):
+    check = RoundTripCheck(intrinsics, cache=MapCache(), grid=(4, 3))
+    result = check.check(rectified_frame)
+    assert result.mean_error < 0.1
+    assert result.mean_error <= result.max_error
+    assert result.region_error.shape == (3, 4)
+    assert np.nanmax(result.region_error) < 1
+
+
+def test_json_record_writes_null_for_nan():
+    record = json_record({'mean_error': float('nan'), 'max_error': 2.0,
+                          'region_error': np.array([[np.nan, 0.12345]])})
+    assert record == {'mean_error': None, 'max_error': 2.0,
+                      'region_error': [[None, 0.123]]}
+    assert 'NaN' not in json.dumps(record)
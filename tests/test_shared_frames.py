@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from stereo_calibration_check.pipeline.shared_frames import (SharedFramePool,
+                                                             attach)
+
+
+def read_frame(frame) -> np.ndarray:
+    array = attach(frame)
+    assert not array.flags.writeable
+    return array.copy()
+
+
+def test_worker_sees_the_written_frames(raw_frame, rectified_frame):
+    shapes = {'cam0': raw_frame.shape, 'cam1': rectified_frame.shape}
+    with SharedFramePool(shapes, slots=2) as pool, ProcessPoolExecutor(
+            max_workers=2) as executor:
+        for slot, (image0, image1) in enumerate(
+                [(raw_frame, rectified_frame),
+                 (rectified_frame[::-1].copy(), raw_frame[::-1].copy())]):
+            frame0 = pool.write(slot, 'cam0', image0)
+            frame1 = pool.write(slot, 'cam1', image1)
+            np.testing.assert_array_equal(
+                executor.submit(read_frame, frame0).result(), image0)
+            np.testing.assert_array_equal(
+                executor.submit(read_frame, frame1).result(), image1)
+        # A slot written again is seen by workers that attached it before.
+        frame0 = pool.write(0, 'cam0', np.zeros_like(raw_frame))
+        assert not executor.submit(read_frame, frame0).result().any()
+
+
+def test_write_rejects_other_shapes(raw_frame):
+    with SharedFramePool({'cam0': raw_frame.shape}, slots=1) as pool:
+        with pytest.raises(ValueError):
+            pool.write(0, 'cam0', raw_frame[1:])
+
+
+def test_segments_are_unlinked_on_close(raw_frame):
+    pool = SharedFramePool({'cam0': raw_frame.shape}, slots=3)
+    names = [pool.write(slot, 'cam0', raw_frame).name
+             for slot in range(pool.slots)]
+    assert len(set(names)) == 3
+    pool.close()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
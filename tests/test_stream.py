@@ -0,0 +1,82 @@
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from stereo_calibration_check.main import main
+from stereo_calibration_check.pipeline.stream import (StreamPipeline,
+                                                      read_frames)
+
+
+def run_with_timeout(pipeline: StreamPipeline, pairs) -> list:
+    # Run in a thread so a hang fails the test instead of blocking it.
+    outcome = {}
+
+    def target():
+        try:
+            outcome['results'] = list(pipeline.run(pairs))
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), 'pipeline did not finish'
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['results']
+
+
+def frame_pairs(n: int):
+    for i in range(n):
+        frame = np.full((4, 4), i, dtype=np.uint8)
+        yield frame, frame
+
+
+def test_results_in_frame_order():
+    pipeline = StreamPipeline(lambda: lambda img1, img2: int(img1[0, 0]),
+                              num_workers=3, max_in_flight=4)
+    results = run_with_timeout(pipeline, frame_pairs(20))
+    assert results == [(i, i) for i in range(20)]
+
+
+def test_failed_check_yields_its_exception():
+
+    def check(img1, img2):
+        if img1[0, 0] == 1:
+            raise ValueError('no matches')
+        return int(img1[0, 0])
+
+    results = run_with_timeout(StreamPipeline(lambda: check), frame_pairs(3))
+    assert results[0] == (0, 0) and results[2] == (2, 2)
+    assert isinstance(results[1][1], ValueError)
+
+
+def test_failing_check_factory_raises():
+
+    def factory():
+        raise RuntimeError('detector not available')
+
+    with pytest.raises(RuntimeError, match='detector not available'):
+        run_with_timeout(StreamPipeline(factory, num_workers=2),
+                         frame_pairs(20))
+
+
+def test_missing_source_raises(tmp_path):
+    pipeline = StreamPipeline(lambda: lambda img1, img2: None)
+    pairs = zip(read_frames(str(tmp_path / 'left.mp4')),
+                read_frames(str(tmp_path)))
+    with pytest.raises(OSError, match='Cannot open video source'):
+        run_with_timeout(pipeline, pairs)
+    with pytest.raises(OSError, match='No frames found'):
+        next(read_frames(str(tmp_path)))
+
+
+def test_cli_reports_unreadable_source(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(sys, 'argv', [
+        'stereo-calibration-check', '--no_map_cache', 'stream',
+        '--left_source', str(tmp_path / 'left.mp4'),
+        '--right_source', str(tmp_path / 'right.mp4')])
+    assert main() == 1
+    assert 'Error: Cannot open video source' in capsys.readouterr().err
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from stereo_calibration_check.calibrate.distort import Redistorter
+from stereo_calibration_check.calibrate.map_cache import MapCache
+from stereo_calibration_check.calibrate import undistort
+from stereo_calibration_check.calibrate.undistort import (Rectifier,
+                                                         build_rectify_maps,
+                                                         rectify_image)
+
+
+@pytest.mark.parametrize('strip_rows', [32, 37])
+def test_strip_rectification_matches_full_frame(intrinsics, projections,
+                                                raw_frame, strip_rows):
+    R1, _, P1, _ = projections
+    full = Rectifier(intrinsics, R1, P1, cache=MapCache())(raw_frame)
+    strips = Rectifier(intrinsics, R1, P1, cache=MapCache(),
+                       strip_rows=strip_rows)(raw_frame)
+    # Maps built per strip may round a few samples to the neighbouring
+    # fixed-point position.
+    diff = np.abs(full.astype(int) - strips)
+    assert diff.max() <= 1
+    assert np.count_nonzero(diff) < 1e-3 * diff.size
+
+
+@pytest.mark.parametrize('strip_rows', [32, 37])
+def test_strip_redistortion_matches_full_frame(intrinsics, rectified_frame,
+                                               strip_rows):
+    full = Redistorter(intrinsics, intrinsics['P'],
+                       cache=MapCache())(rectified_frame)
+    strips = Redistorter(intrinsics, intrinsics['P'], cache=MapCache(),
+                         strip_rows=strip_rows)(rectified_frame)
+    np.testing.assert_array_equal(strips, full)
+
+
+def test_prepare_builds_every_strip_once(intrinsics, projections, raw_frame,
+                                        counting_rectifier):
+    R1, _, P1, _ = projections
+    h, w = raw_frame.shape
+    cache = MapCache(maxsize=2)
+    rectifier = counting_rectifier(intrinsics, R1, P1, cache=cache,
+                                   strip_rows=64)
+    rectifier.prepare((w, h))
+    strips = rectifier.strips((w, h))
+    assert counting_rectifier.calls == [((w, h), rows) for rows in strips]
+    assert strips[0][0] == 0 and strips[-1][1] == h
+    # Strip maps stay on the rectifier, the shared LRU is left alone.
+    assert len(cache) == 0
+
+    rectifier(raw_frame)
+    rectifier(raw_frame)
+    assert len(counting_rectifier.calls) == len(strips)
+
+
+def test_persisted_strip_maps_are_memory_mapped(intrinsics, projections,
+                                                raw_frame, tmp_path):
+    R1, _, P1, _ = projections
+    rectifier = Rectifier(intrinsics, R1, P1,
+                          cache=MapCache(cache_dir=str(tmp_path)),
+                          strip_rows=64)
+    out = np.empty_like(raw_frame)
+    assert rectifier(raw_frame, out) is out
+    h, w = raw_frame.shape
+    for rows in rectifier.strips((w, h)):
+        assert all(isinstance(m, np.memmap) for m in rectifier.maps((w, h),
+                                                                    rows))
+
+
+def test_rectify_image_reuses_strip_maps(intrinsics, projections, raw_frame,
+                                         monkeypatch):
+    R1, _, P1, _ = projections
+    calls = []
+
+    def counting_build(*args, **kwargs):
+        calls.append(args)
+        return build_rectify_maps(*args, **kwargs)
+
+    monkeypatch.setattr(undistort, 'build_rectify_maps', counting_build)
+    first = rectify_image(raw_frame, None, intrinsics, R1, P1, strip_rows=128)
+    num_strips = len(calls)
+    out = np.empty_like(raw_frame)
+    second = rectify_image(raw_frame, None, intrinsics, R1, P1,
+                           strip_rows=128, out=out)
+    assert second is out
+    np.testing.assert_array_equal(second, first)
+    assert len(calls) == num_strips == 4
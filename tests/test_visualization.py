@@ -0,0 +1,65 @@
+import subprocess
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+from stereo_calibration_check.utils.visualization import (ImageWriter,
+                                                          side_by_side,
+                                                          slugify)
+
+
+def test_writes_images_in_the_background(tmp_path, raw_frame,
+                                         rectified_frame):
+    with ImageWriter(str(tmp_path), max_pending=1) as writer:
+        path = writer.submit_side_by_side(raw_frame, rectified_frame,
+                                          'Rectified Images')
+        single = writer.submit('single', raw_frame)
+    assert path == str(tmp_path / 'rectified_images.png')
+    np.testing.assert_array_equal(
+        cv2.imread(path, cv2.IMREAD_GRAYSCALE),
+        np.hstack((raw_frame, rectified_frame)))
+    np.testing.assert_array_equal(cv2.imread(single, cv2.IMREAD_GRAYSCALE),
+                                  raw_frame)
+
+
+def test_jpeg_quality(tmp_path, raw_frame):
+    sizes = {}
+    for quality in (30, 95):
+        with ImageWriter(str(tmp_path / str(quality)), 'jpg',
+                         jpeg_quality=quality) as writer:
+            path = writer.submit('frame', raw_frame)
+        sizes[quality] = (tmp_path / str(quality) / 'frame.jpg').stat().st_size
+        assert path.endswith('.jpg')
+    assert sizes[30] < sizes[95]
+
+
+def test_write_errors_are_raised(tmp_path, raw_frame):
+    writer = ImageWriter(str(tmp_path))
+    # A directory where the image file should go cannot be written.
+    (tmp_path / 'taken.png').mkdir()
+    writer.submit('taken', raw_frame)
+    with pytest.raises(OSError):
+        writer.close()
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        ImageWriter(str(tmp_path), 'gif')
+
+
+def test_side_by_side_mixes_gray_and_color(raw_frame):
+    color = cv2.cvtColor(raw_frame, cv2.COLOR_GRAY2BGR)
+    combined = side_by_side(raw_frame, color)
+    assert combined.shape == (raw_frame.shape[0], 2 * raw_frame.shape[1], 3)
+    assert slugify('Epilines on Distorted Back Images') == \
+        'epilines_on_distorted_back_images'
+
+
+def test_headless_import_does_not_load_matplotlib():
+    code = ('import sys; import stereo_calibration_check.main; '
+            'print("matplotlib" in sys.modules)')
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True).stdout
+    assert output.strip() == 'False'